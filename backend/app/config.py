@@ -0,0 +1,18 @@
+# 設定の読み込み（.env はプロセス内で1回だけ読み込む）
+import threading
+
+from dotenv import load_dotenv
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_config() -> None:
+    """.env を環境変数に読み込む（2回目以降は何もしない）"""
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if not _loaded:
+            load_dotenv()
+            _loaded = True
@@ -1,11 +1,17 @@
 import os
-from fastapi import FastAPI, Depends
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
-from .routes import router as api_router
+from .config import load_config
+
+# .envファイルを読み込み（各モジュールが設定を読む前に1回だけ）
+load_config()
 
-# .envファイルを読み込み
-load_dotenv()
+from .routes import router as api_router
+from .services.metrics import metrics, HTTP_REQUEST_SECONDS, PROMETHEUS_CONTENT_TYPE
+from .services.services import ai_service, recommendation_pool, serendipity_engine
 
 # 環境変数からCORS設定を取得
 FRONTEND_URL = os.getenv("FRONTEND_URL", "https://hack1-anti-optimized-system.onrender.com")
@@ -22,12 +28,23 @@ ALLOWED_ORIGINS = [
 if os.getenv("DEBUG", "false").lower() == "true":
     ALLOWED_ORIGINS.append("*")
 
+# Geminiクライアントの生成はリクエストを待たせないよう起動直後にバックグラウンドで行う（false で初回呼び出し時）
+AI_WARMUP = os.getenv("AI_WARMUP", "true").lower() == "true"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    serendipity_engine.warm_up()
+    if AI_WARMUP:
+        ai_service.warm_up()
+    yield
+
 app = FastAPI(
     title="Seren Paths API",
     description="アンチ最適化による新しい体験発見サービス",
     version="1.0.0",
     docs_url="/docs" if os.getenv("DEBUG", "false").lower() == "true" else None,
-    redoc_url="/redoc" if os.getenv("DEBUG", "false").lower() == "true" else None
+    redoc_url="/redoc" if os.getenv("DEBUG", "false").lower() == "true" else None,
+    lifespan=lifespan
 )
 
 # CORS設定（重複を削除）
@@ -42,6 +59,62 @@ app.add_middleware(
 
 app.include_router(api_router, prefix="/api")
 
+# ブレーカー・キャッシュ・プールの状態は /metrics の出力時に取得する
+CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+metrics.gauge_callback(
+    "seren_ai_circuit_state", "AI circuit breaker state (0=closed, 1=half_open, 2=open)",
+    lambda: CIRCUIT_STATE_VALUES.get(ai_service.circuit_breaker.state, 0)
+)
+metrics.gauge_callback(
+    "seren_ai_response_cache_lookups", "AI response cache lookups by result",
+    lambda: {"hit": ai_service.response_cache.hits, "miss": ai_service.response_cache.misses}
+    if ai_service.response_cache is not None else None,
+    labelname="result"
+)
+metrics.gauge_callback(
+    "seren_ai_in_flight", "Distinct Gemini prompts currently in flight",
+    lambda: ai_service.single_flight.stats()["in_flight"]
+)
+metrics.gauge_callback(
+    "seren_recommendation_pool_stocked", "Precomputed recommendations waiting in the pool",
+    lambda: recommendation_pool.stats()["stocked"]
+)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """ルートごとのレイテンシを記録（パスはテンプレートで集計）
+
+    ストリーミングレスポンスも含め、本文を送り終えた時点までを計測する。
+    """
+    started = time.perf_counter()
+    
+    def observe(status: str) -> None:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status
+        )
+    
+    try:
+        response = await call_next(request)
+    except Exception:
+        observe("500")
+        raise
+    
+    body_iterator = response.body_iterator
+    
+    async def observed_body():
+        try:
+            async for chunk in body_iterator:
+                yield chunk
+        finally:
+            observe(str(response.status_code))
+    
+    response.body_iterator = observed_body()
+    return response
+
 @app.get("/")
 async def read_root():
     return {
@@ -56,4 +129,9 @@ async def health_check():
         "status": "healthy",
         "service": "Seren Paths API",
         "version": "1.0.0"
-    }
\ No newline at end of file
+    }
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus形式のメトリクス"""
+    return Response(content=metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,17 +1,42 @@
 # backend/app/routes.py
 from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import Response
-from typing import List, Dict, Any  # Listを追加
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import List, Dict, Any, Optional  # Listを追加
 from datetime import datetime, timedelta  
+import logging
 
 from .services import (
     get_recommendation_service, 
+    stream_recommendation_service,
     process_feedback_service, 
     update_preferences_service,
     analyze_growth_trends,
+    resolve_user_experiences,
+    resolve_user_context,
+    append_history_service,
+    get_history_service,
     serendipity_engine
 )
-from .services.visualization_service import VisualizationService
+from .services.visualization_service import (
+    visualization_service,
+    DEFAULT_MAX_PRIMITIVES,
+    parse_bounds,
+    parse_visualization_sections
+)
+from .services.visualization_encoding import (
+    FORMAT_JSON,
+    FORMAT_MSGPACK,
+    MSGPACK_AVAILABLE,
+    select_visualization_format,
+    encode_columnar
+)
+from .services.streaming import (
+    STREAM_HEADERS,
+    STREAM_MEDIA_TYPES,
+    select_stream_format,
+    encode_stream
+)
+from .services.metrics import STAGE_SECONDS
 # 既存のインポートに追加
 from .schemas import (
     RecommendationRequest, 
@@ -22,13 +47,26 @@ from .schemas import (
     AnalysisResponse,
     UserStatsResponse,
     ThemeChallengeResponse,
-    GrowthAnalysisResponse
+    GrowthAnalysisResponse,
+    HistoryAppendRequest,
+    HistoryResponse,
+    VisualizationIncrementalRequest
 )
 
 router = APIRouter()
 
-# VisualizationServiceのインスタンス化
-visualization_service = VisualizationService()
+logger = logging.getLogger(__name__)
+
+def _visualization_not_modified(request: Request, etag: str) -> Optional[Response]:
+    """If-None-Match がETagと弱い比較で一致すれば304を返す"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    opaque_tag = etag.removeprefix("W/")
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in tags or opaque_tag in [tag.removeprefix("W/") for tag in tags]:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
 
 # CORS プリフライトリクエスト対応
 @router.options("/{path:path}")
@@ -76,14 +114,15 @@ async def get_active_themes():
 async def analyze_growth(experiences: List[Dict[str, Any]]):
     """成長分析を実行"""
     try:
-        analysis = analyze_growth_trends(experiences)
+        analysis = await analyze_growth_trends(experiences)
         
         # AIによる深い分析も追加
-        ai_insights = await serendipity_engine.ai_service.analyze_growth_pattern(experiences)
+        from .services.services import ai_service
+        ai_insights = await ai_service.aanalyze_growth_pattern(experiences)
         
         return GrowthAnalysisResponse(
             status="success",
-            growth_stage=analysis['growth_stage'],
+            growth_stage=analysis.get('growth_stage', analysis.get('growth_trend', 'developing')),
             insights=ai_insights.get('insights', []),
             next_challenges=ai_insights.get('next_challenges', []),
             diversity_score=analysis['diversity_score'],
@@ -92,30 +131,71 @@ async def analyze_growth(experiences: List[Dict[str, Any]]):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"成長分析に失敗しました: {str(e)}")
 
+@router.post("/growth/analysis/stream")
+async def stream_growth_analysis(experiences: List[Dict[str, Any]], http_request: Request, format: Optional[str] = None):
+    """成長分析を段階的に取得（Server-Sent Events または NDJSON）
+
+    ルールベースの分析（base）を即座に返し、AIの分析結果をフィールドが完成するたびに（field）、
+    最後に /growth/analysis と同じ形式の結果（done）を返す。
+    """
+    from .services.services import ai_service
+    
+    profile = serendipity_engine.get_user_profile(experiences)
+    user_analysis = profile.analysis
+    diversity_score = user_analysis.get('diversity_score', 0.0)
+    base = {
+        "status": "success",
+        "growth_stage": "expanding" if diversity_score > 0.6 else "developing",
+        "diversity_score": diversity_score,
+        "category_distribution": user_analysis.get('category_distribution', {})
+    }
+    
+    async def events():
+        yield {"event": "base", "data": base}
+        async for event in ai_service.astream_growth_pattern(experiences, user_analysis):
+            if event["event"] == "done":
+                ai_insights = event["data"] or {}
+                event = {"event": "done", "data": {
+                    **base,
+                    "insights": ai_insights.get('insights', []),
+                    "next_challenges": ai_insights.get('next_challenges', [])
+                }}
+            yield event
+    
+    stream_format = select_stream_format(http_request.headers.get("accept"), format)
+    return StreamingResponse(
+        encode_stream(events(), stream_format),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+        headers=STREAM_HEADERS
+    )
+
+# ジャーナルの基本テンプレート
+JOURNAL_TEMPLATES = [
+    {
+        "id": "discovery",
+        "title": "今日の小さな発見",
+        "prompts": ["何を発見しましたか？", "どんな気持ちになりましたか？"],
+        "tags": ["発見", "気づき", "新鮮"]
+    },
+    {
+        "id": "challenge",
+        "title": "挑戦したこと",
+        "prompts": ["どんな挑戦でしたか？", "結果はどうでしたか？"],
+        "tags": ["挑戦", "成長", "勇気"]
+    },
+    {
+        "id": "emotion",
+        "title": "心が動いた瞬間",
+        "prompts": ["何に心を動かされましたか？", "なぜそう感じたと思いますか？"],
+        "tags": ["感動", "気持ち", "内省"]
+    }
+]
+
 @router.post("/journal/templates")
 async def get_journal_templates(user_context: Dict[str, Any]):
     """パーソナライズされたジャーナルテンプレートを取得"""
     try:
-        templates = [
-            {
-                "id": "discovery",
-                "title": "今日の小さな発見",
-                "prompts": ["何を発見しましたか？", "どんな気持ちになりましたか？"],
-                "tags": ["発見", "気づき", "新鮮"]
-            },
-            {
-                "id": "challenge",
-                "title": "挑戦したこと",
-                "prompts": ["どんな挑戦でしたか？", "結果はどうでしたか？"],
-                "tags": ["挑戦", "成長", "勇気"]
-            },
-            {
-                "id": "emotion",
-                "title": "心が動いた瞬間",
-                "prompts": ["何に心を動かされましたか？", "なぜそう感じたと思いますか？"],
-                "tags": ["感動", "気持ち", "内省"]
-            }
-        ]
+        templates = list(JOURNAL_TEMPLATES)
         
         # AIでパーソナライズ
         if user_context.get('recent_experiences'):
@@ -129,71 +209,147 @@ async def get_journal_templates(user_context: Dict[str, Any]):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"テンプレート取得に失敗しました: {str(e)}")
 
+@router.post("/journal/templates/stream")
+async def stream_journal_templates(user_context: Dict[str, Any], http_request: Request, format: Optional[str] = None):
+    """ジャーナルテンプレートを1件ずつ取得（Server-Sent Events または NDJSON）
+
+    テンプレートごとに template を、最後に /journal/templates と同じ形式の結果（done）を返す。
+    """
+    async def events():
+        for template in JOURNAL_TEMPLATES:
+            yield {"event": "template", "data": template}
+        yield {"event": "done", "data": {"templates": JOURNAL_TEMPLATES}}
+    
+    stream_format = select_stream_format(http_request.headers.get("accept"), format)
+    return StreamingResponse(
+        encode_stream(events(), stream_format),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+        headers=STREAM_HEADERS
+    )
+
+def _challenge_response(data: Dict[str, Any]) -> JSONResponse:
+    """ChallengeResponse としての検証とシリアライズを計測しながら行う
+
+    検証済みのJSONを直接返すため、response_model による同じ検証は繰り返されない。
+    """
+    with STAGE_SECONDS.time(stage="response_validation"):
+        content = ChallengeResponse.model_validate(data).model_dump(mode="json")
+    return JSONResponse(content=content)
+
 @router.post("/recommendations", response_model=ChallengeResponse)
 async def get_recommendation_endpoint(request: RecommendationRequest):
     """パーソナライズされたチャレンジを取得"""
     try:
-        print(f"🔄 Recommendation request received:")
-        print(f"   Level: {request.level}")
-        print(f"   Preferences: {request.preferences}")
-        print(f"   Experiences count: {len(request.experiences) if request.experiences else 0}")
+        logger.debug("🔄 Recommendation request received: level=%s preferences=%s experiences=%d",
+                     request.level, request.preferences, len(request.experiences) if request.experiences else 0)
         
-        result = get_recommendation_service(
+        experiences, profile = resolve_user_context(request.user_id, request.experiences)
+        result = await get_recommendation_service(
             request.level, 
             request.preferences, 
-            request.experiences
+            experiences,
+            profile=profile
         )
         
-        print(f"📤 Service result: {result}")
+        logger.debug("📤 Service result: %s", result)
         
         if result.get("status") == "success" and "data" in result:
-            return result["data"]
+            return _challenge_response(result["data"])
         else:
-            return result.get("data", {})
+            return _challenge_response(result.get("data", {}))
     except Exception as e:
-        print(f"❌ Recommendation endpoint error: {str(e)}")
+        logger.error("❌ Recommendation endpoint error: %s", e)
         raise HTTPException(status_code=500, detail=f"レコメンド生成に失敗しました: {str(e)}")
 
+@router.post("/recommendations/stream")
+async def stream_recommendation_endpoint(request: RecommendationRequest, http_request: Request, format: Optional[str] = None):
+    """レコメンドを段階的に取得（Server-Sent Events または NDJSON）
+
+    ルールベースの結果（base）を即座に返し、AIの結果（update）を届いた順に、
+    最後に /recommendations と同じ形式の結果（done）を返す。
+    Accept: text/event-stream または ?format=sse でSSE、既定はNDJSON。
+    """
+    try:
+        experiences, profile = resolve_user_context(request.user_id, request.experiences)
+    except Exception as e:
+        logger.error("❌ Recommendation stream endpoint error: %s", e)
+        raise HTTPException(status_code=500, detail=f"レコメンド生成に失敗しました: {str(e)}")
+    
+    stream_format = select_stream_format(http_request.headers.get("accept"), format)
+    events = stream_recommendation_service(request.level, request.preferences, experiences, profile=profile)
+    return StreamingResponse(
+        encode_stream(events, stream_format),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+        headers=STREAM_HEADERS
+    )
+
 @router.post("/recommendations/ai", response_model=ChallengeResponse)
 async def get_ai_recommendation_endpoint(request: RecommendationRequest):
     """AI専用レコメンデーション（詳細プロンプト使用）"""
     try:
-        print(f"🤖 AI Recommendation request received:")
-        print(f"   Level: {request.level}")
-        print(f"   Experiences count: {len(request.experiences) if request.experiences else 0}")
+        logger.debug("🤖 AI Recommendation request received: level=%s experiences=%d",
+                     request.level, len(request.experiences) if request.experiences else 0)
         
         # AIサービスから直接取得
         from .services.services import ai_service
         
-        if not ai_service.enabled:
+        if not ai_service.available:
             raise HTTPException(status_code=503, detail="AI service is not available")
         
-        ai_recommendation = ai_service.generate_ai_recommendation(
+        ai_recommendation = await ai_service.agenerate_ai_recommendation(
             request.preferences, 
-            request.experiences or [], 
+            resolve_user_context(request.user_id, request.experiences)[0], 
             request.level
         )
         
         if ai_recommendation:
-            print(f"✅ AI recommendation generated: {ai_recommendation.get('title', 'Unknown')}")
-            return ai_recommendation
+            logger.debug("✅ AI recommendation generated: %s", ai_recommendation.get('title', 'Unknown'))
+            return _challenge_response(ai_recommendation)
         else:
             raise HTTPException(status_code=500, detail="AI recommendation generation failed")
             
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ AI Recommendation endpoint error: {str(e)}")
+        logger.error("❌ AI Recommendation endpoint error: %s", e)
+        raise HTTPException(status_code=500, detail=f"AI レコメンド生成に失敗しました: {str(e)}")
+
+@router.post("/recommendations/ai/stream")
+async def stream_ai_recommendation_endpoint(request: RecommendationRequest, http_request: Request, format: Optional[str] = None):
+    """AI専用レコメンデーションのストリーミング版
+
+    Geminiのトークンストリームをパースし、title / description などが完成するたびに
+    field イベントを返す。最後に /recommendations/ai と同じ結果を done イベントで返す。
+    """
+    from .services.services import ai_service
+    
+    if not ai_service.available:
+        raise HTTPException(status_code=503, detail="AI service is not available")
+    
+    try:
+        experiences = resolve_user_context(request.user_id, request.experiences)[0]
+    except Exception as e:
+        logger.error("❌ AI Recommendation stream endpoint error: %s", e)
         raise HTTPException(status_code=500, detail=f"AI レコメンド生成に失敗しました: {str(e)}")
+    
+    stream_format = select_stream_format(http_request.headers.get("accept"), format)
+    events = ai_service.astream_ai_recommendation(request.preferences, experiences, request.level)
+    return StreamingResponse(
+        encode_stream(events, stream_format),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+        headers=STREAM_HEADERS
+    )
 
 @router.post("/feedback", response_model=StandardResponse)
 async def send_feedback_endpoint(request: FeedbackRequest):
     """体験フィードバックを送信（学習機能付き）"""
     try:
+        if request.user_id and request.experiences:
+            append_history_service(request.user_id, request.experiences)
         result = process_feedback_service(
             request.experience_id, 
             request.feedback,
-            request.experiences
+            user_id=request.user_id
         )
         return result
     except Exception as e:
@@ -203,20 +359,24 @@ async def send_feedback_endpoint(request: FeedbackRequest):
 async def update_preferences_endpoint(request: PreferencesUpdateRequest):
     """ユーザー嗜好を更新（成長分析付き）"""
     try:
-        result = update_preferences_service(request.experiences)
+        result = update_preferences_service(
+            resolve_user_experiences(request.user_id, request.experiences)
+        )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"嗜好更新に失敗しました: {str(e)}")
 
 @router.get("/user/stats", response_model=UserStatsResponse)
-async def get_user_stats(experiences: str = "[]"):
+async def get_user_stats(experiences: str = "[]", user_id: Optional[str] = None):
     """ユーザー統計情報を取得"""
     try:
         import json
         experiences_data = json.loads(experiences) if experiences != "[]" else []
         
-        analysis = serendipity_engine._analyze_user_preferences(experiences_data)
-        trends = analyze_growth_trends(experiences_data)
+        # 分析は一度だけ行い、統計とトレンドの両方で使う
+        experiences_data, profile = resolve_user_context(user_id, experiences_data)
+        analysis = profile.analysis
+        trends = await analyze_growth_trends(experiences_data, profile)
         
         # アチーブメント計算
         achievements = []
@@ -226,19 +386,35 @@ async def get_user_stats(experiences: str = "[]"):
             achievements.append("体験コレクター")
         if analysis['diversity_score'] >= 0.7:
             achievements.append("多様性マスター")
-        if trends['diversity_change'] > 1:
+        if trends.get('diversity_change', 0) > 1:
             achievements.append("成長の軌跡")
         
         return UserStatsResponse(
             total_experiences=analysis['total_experiences'],
             diversity_score=analysis['diversity_score'],
-            growth_trend=trends['trend'],
-            recent_categories=analysis['preferred_categories'][:3],
+            growth_trend=trends.get('growth_trend', 'developing'),
+            recent_categories=profile.favorite_categories[:3],
             achievements=achievements
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"統計取得に失敗しました: {str(e)}")
 
+@router.post("/history/{user_id}/experiences", response_model=HistoryResponse)
+async def append_history_endpoint(user_id: str, request: HistoryAppendRequest):
+    """体験履歴をサーバー側に追記"""
+    try:
+        return append_history_service(user_id, request.experiences)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"履歴の保存に失敗しました: {str(e)}")
+
+@router.get("/history/{user_id}", response_model=HistoryResponse)
+async def get_history_endpoint(user_id: str, cursor: int = 0, limit: Optional[int] = None):
+    """カーソル以降の体験履歴を取得"""
+    try:
+        return get_history_service(user_id, cursor, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"履歴の取得に失敗しました: {str(e)}")
+
 @router.get("/challenges/levels")
 async def get_challenge_levels():
     """チャレンジレベル情報を取得"""
@@ -268,35 +444,111 @@ async def get_challenge_levels():
 @router.get("/health")
 async def health_check():
     """ヘルスチェック"""
+    from .services.services import ai_service
+    
     return {
         "status": "healthy", 
         "service": "Seren Paths API",
         "engine_version": "2.0",
-        "features": ["personalization", "learning", "anti-optimization"]
+        "features": ["personalization", "learning", "anti-optimization"],
+        "ai_circuit": ai_service.circuit_breaker.snapshot(),
+        "ai_rate_limit": ai_service.rate_limiter.stats(),
+        "ai_single_flight": ai_service.single_flight.stats(),
+        "ai_batching": ai_service.batcher.stats() if ai_service.batcher is not None else None
     }
 
 @router.post("/visualization/experience-strings")
-async def get_experience_strings_visualization(experiences: List[Dict[str, Any]]):
-    """ExperienceStringsの3Dビジュアライゼーションデータを取得"""
+async def get_experience_strings_visualization(experiences: List[Dict[str, Any]], request: Request, response: Response,
+                                               format: Optional[str] = None, include: Optional[str] = None,
+                                               max_primitives: Optional[int] = None, bounds: Optional[str] = None):
+    """ExperienceStringsの3Dビジュアライゼーションデータを取得
+
+    Acceptヘッダー（application/x-msgpack, application/octet-stream）または
+    ?format=msgpack|binary でカラム形式のバイナリを返す。既定はJSON。
+    ?include=spiral,floating,curves,stats で必要なセクションだけを1回のリクエストで取得できる。
+    ?max_primitives=N（既定はVISUALIZATION_MAX_PRIMITIVES、0で無制限）で球体＋曲線＋浮遊ミッションの数を抑え、
+    ?bounds=minX,minY,minZ,maxX,maxY,maxZ で範囲外の球体を除外する。
+    """
+    try:
+        sections = parse_visualization_sections(include)
+        view_bounds = parse_bounds(bounds)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if max_primitives is None:
+        max_primitives = DEFAULT_MAX_PRIMITIVES
+    if max_primitives < 0:
+        raise HTTPException(status_code=400, detail="max_primitives must be >= 0")
+    
     try:
-        print(f"📊 ビジュアライゼーションリクエスト受信: {len(experiences)}件の体験データ")
-        visualization_data = visualization_service.generate_visualization_data(experiences)
-        print("✅ ビジュアライゼーションデータ生成成功")
+        logger.debug("📊 ビジュアライゼーションリクエスト受信: %d件の体験データ", len(experiences))
+        output_format = select_visualization_format(request.headers.get("accept"), format)
+        if output_format == FORMAT_MSGPACK and not MSGPACK_AVAILABLE:
+            output_format = FORMAT_JSON
+        
+        etag = visualization_service.compute_etag(
+            experiences, f"experience-strings:{output_format}:{','.join(sections)}:{max_primitives}:{view_bounds}"
+        )
+        not_modified = _visualization_not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        
+        if output_format != FORMAT_JSON:
+            columnar_data = visualization_service.generate_columnar_visualization_data(
+                experiences, sections, max_primitives, view_bounds
+            )
+            content, media_type = encode_columnar(columnar_data, output_format)
+            return Response(content=content, media_type=media_type, headers={"Vary": "Accept", "ETag": etag})
+        
+        visualization_data = visualization_service.generate_visualization_data(
+            experiences, sections, max_primitives, view_bounds
+        )
+        logger.debug("✅ ビジュアライゼーションデータ生成成功")
+        response.headers["ETag"] = etag
+        response.headers["Vary"] = "Accept"
         return {
             "status": "success",
             "data": visualization_data
         }
     except Exception as e:
-        print(f"❌ ビジュアライゼーション生成エラー: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ ビジュアライゼーション生成エラー: %s", e)
         raise HTTPException(status_code=500, detail=f"ビジュアライゼーション生成エラー: {str(e)}")
 
-@router.post("/visualization/spiral-positions")
-async def get_spiral_positions(experiences: List[Dict[str, Any]]):
-    """完了済み体験のらせん配置データを取得"""
+@router.post("/visualization/incremental")
+async def get_incremental_visualization(request: VisualizationIncrementalRequest):
+    """前回の描画からの差分（新規・変化した球体と曲線）を取得
+
+    tokenなしで全履歴を送ると mode=full、以降は返されたtokenと追加分だけを送ると mode=delta。
+    送られた体験は共有の履歴ストアにも追記し、tokenが別ワーカーのもの・期限切れの場合は
+    ストアの全履歴からレイアウトを作り直して mode=full を返す。
+    """
     try:
+        if request.experiences:
+            append_history_service(request.user_id, request.experiences)
+        result = visualization_service.generate_incremental_visualization(
+            request.user_id, request.experiences, request.token
+        )
+        if result is None:
+            history = get_history_service(request.user_id)["experiences"]
+            result = visualization_service.generate_incremental_visualization(request.user_id, history)
+    except Exception as e:
+        logger.error("❌ 増分ビジュアライゼーション生成エラー: %s", e)
+        raise HTTPException(status_code=500, detail=f"増分ビジュアライゼーション生成エラー: {str(e)}")
+    return {
+        "status": "success",
+        "data": result
+    }
+
+@router.post("/visualization/spiral-positions", deprecated=True)
+async def get_spiral_positions(experiences: List[Dict[str, Any]], request: Request, response: Response):
+    """完了済み体験のらせん配置データを取得（/visualization/experience-strings?include=spiral を推奨）"""
+    try:
+        etag = visualization_service.compute_etag(experiences, "spiral-positions")
+        not_modified = _visualization_not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        
         spiral_positions = visualization_service.compute_spiral_positions(experiences)
+        response.headers["ETag"] = etag
         return {
             "status": "success",
             "data": spiral_positions
@@ -304,11 +556,17 @@ async def get_spiral_positions(experiences: List[Dict[str, Any]]):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"らせん位置計算エラー: {str(e)}")
 
-@router.post("/visualization/floating-positions") 
-async def get_floating_positions(experiences: List[Dict[str, Any]]):
-    """進行中ミッションの浮遊配置データを取得"""
+@router.post("/visualization/floating-positions", deprecated=True)
+async def get_floating_positions(experiences: List[Dict[str, Any]], request: Request, response: Response):
+    """進行中ミッションの浮遊配置データを取得（/visualization/experience-strings?include=floating を推奨）"""
     try:
+        etag = visualization_service.compute_etag(experiences, "floating-positions")
+        not_modified = _visualization_not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        
         floating_positions = visualization_service.compute_floating_positions(experiences)
+        response.headers["ETag"] = etag
         return {
             "status": "success",
             "data": floating_positions
@@ -316,11 +574,17 @@ async def get_floating_positions(experiences: List[Dict[str, Any]]):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"浮遊位置計算エラー: {str(e)}")
 
-@router.post("/visualization/connection-curves")
-async def get_connection_curves(spiral_positions: List[Dict[str, Any]]):
-    """球体間の接続曲線データを取得"""
+@router.post("/visualization/connection-curves", deprecated=True)
+async def get_connection_curves(spiral_positions: List[Dict[str, Any]], request: Request, response: Response):
+    """球体間の接続曲線データを取得（/visualization/experience-strings?include=curves を推奨）"""
     try:
+        etag = visualization_service.compute_etag(spiral_positions, "connection-curves")
+        not_modified = _visualization_not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        
         connection_curves = visualization_service.compute_connection_curves(spiral_positions)
+        response.headers["ETag"] = etag
         return {
             "status": "success",
             "data": connection_curves
@@ -6,15 +6,26 @@ from datetime import datetime
 class RecommendationRequest(BaseModel):
     level: int = Field(..., ge=1, le=3, description="チャレンジレベル")
     preferences: Dict[str, Any] = Field(default_factory=dict, description="ユーザー設定")
-    experiences: Optional[List[Dict[str, Any]]] = Field(default=None, description="過去の体験履歴")
+    experiences: Optional[List[Dict[str, Any]]] = Field(default=None, description="過去の体験履歴（user_id指定時は未同期分のみ）")
+    user_id: Optional[str] = Field(default=None, description="サーバー側履歴のユーザーID")
 
 class FeedbackRequest(BaseModel):
     experience_id: str = Field(..., description="体験ID")
     feedback: str = Field(..., description="フィードバック内容")
-    experiences: Optional[List[Dict[str, Any]]] = Field(default=None, description="ユーザーの体験履歴")
+    experiences: Optional[List[Dict[str, Any]]] = Field(default=None, description="ユーザーの体験履歴（user_id指定時は未同期分のみ）")
+    user_id: Optional[str] = Field(default=None, description="サーバー側履歴のユーザーID")
 
 class PreferencesUpdateRequest(BaseModel):
-    experiences: List[Dict[str, Any]] = Field(..., description="体験履歴")
+    experiences: Optional[List[Dict[str, Any]]] = Field(default=None, description="体験履歴（user_id指定時は未同期分のみ）")
+    user_id: Optional[str] = Field(default=None, description="サーバー側履歴のユーザーID")
+
+class HistoryAppendRequest(BaseModel):
+    experiences: List[Dict[str, Any]] = Field(..., description="追記する体験")
+
+class HistoryResponse(BaseModel):
+    user_id: str
+    cursor: int
+    experiences: List[Dict[str, Any]] = Field(default_factory=list)
 
 class ChallengeResponse(BaseModel):
     title: str
@@ -102,6 +113,12 @@ class VisualizationStats(BaseModel):
     incomplete_count: int
     categories: Dict[str, int]
 
+class VisualizationIncrementalRequest(BaseModel):
+    """増分ビジュアライゼーションのリクエスト"""
+    user_id: str = Field(..., description="レイアウト状態を保持するユーザーID")
+    token: Optional[str] = Field(default=None, description="前回のレスポンスのtoken（なしの場合は全履歴を送る）")
+    experiences: List[Dict[str, Any]] = Field(default_factory=list, description="全履歴、またはtoken以降に追加・変更された体験")
+
 class VisualizationDataResponse(BaseModel):
     """ビジュアライゼーションデータのレスポンス"""
     status: str
@@ -1,58 +1,114 @@
 # AI推奨サービス（LangChain + Google Gemini統合）
 import os
-from typing import Dict, List, Any, Optional
+import asyncio
+import importlib.util
+import logging
+import time
+import threading
+import concurrent.futures
+import weakref
+from typing import Dict, List, Any, Optional, Awaitable, AsyncIterator, Tuple, TypeVar
 from datetime import datetime
 import json
-from dotenv import load_dotenv
+from ..config import load_config
 from .prompt_loader import PromptLoader
+from .response_cache import ResponseCache, create_response_cache
+from .json_stream import IncrementalJSONParser
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .rate_limiter import LLMRateLimiter, RateLimitedError
+from .single_flight import SingleFlight
+from .micro_batcher import MicroBatcher
+from .metrics import AI_CALLS, STAGE_SECONDS
 
-# LangChainのインポート
-try:
-    from langchain_google_genai import ChatGoogleGenerativeAI
-    from langchain_core.messages import HumanMessage
-    LANGCHAIN_AVAILABLE = True
-except ImportError:
-    LANGCHAIN_AVAILABLE = False
-    print("⚠️ LangChain Google GenAI not installed, running in fallback mode")
+logger = logging.getLogger('ai_service')
+
+# LangChainは起動時間を短くするため初回のAI呼び出し時に読み込む（ここではインストール有無のみ確認）
+LANGCHAIN_AVAILABLE = all(
+    importlib.util.find_spec(name) is not None for name in ("langchain_google_genai", "langchain_core")
+)
+if not LANGCHAIN_AVAILABLE:
+    logger.warning("⚠️ LangChain Google GenAI not installed, running in fallback mode")
+
+ChatGoogleGenerativeAI = None
+HumanMessage = None
+_langchain_lock = threading.Lock()
+
+
+def _import_langchain() -> None:
+    """LangChainのクラスを読み込む（初回のみ）"""
+    global ChatGoogleGenerativeAI, HumanMessage
+    with _langchain_lock:
+        if ChatGoogleGenerativeAI is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI as chat_model_class
+            from langchain_core.messages import HumanMessage as message_class
+            ChatGoogleGenerativeAI = chat_model_class
+            HumanMessage = message_class
 
 # .envファイルを読み込む
-load_dotenv()
+load_config()
+
+T = TypeVar("T")
+
+# 使用するモデル名
+MODEL_NAME = "gemma-3-27b-it"
+
+# 同時に実行するGemini呼び出しの上限と1回あたりのタイムアウト（秒）
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+DEFAULT_CALL_TIMEOUT = float(os.getenv("AI_CALL_TIMEOUT", "20"))
+
+# 複数ユーザーの呼び出しをまとめて実行するマイクロバッチ（既定は無効）
+DEFAULT_BATCH_ENABLED = os.getenv("AI_BATCH_ENABLED", "false").lower() == "true"
+DEFAULT_BATCH_MAX_SIZE = int(os.getenv("AI_BATCH_MAX_SIZE", "8"))
+DEFAULT_BATCH_MAX_WAIT = float(os.getenv("AI_BATCH_MAX_WAIT_MS", "20")) / 1000.0
+
+# マイクロバッチの対象にする呼び出し種別（応答を急がないもの）
+BATCHED_CALL_KINDS = frozenset({"enhancement", "growth_analysis"})
 
 class AIRecommendationService:
-    def __init__(self):
-        # プロンプトローダーを初期化
-        self.prompt_loader = PromptLoader()
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, call_timeout: float = DEFAULT_CALL_TIMEOUT,
+                 response_cache: Optional[ResponseCache] = None, circuit_breaker: Optional[CircuitBreaker] = None,
+                 rate_limiter: Optional[LLMRateLimiter] = None, batch_enabled: bool = DEFAULT_BATCH_ENABLED,
+                 batch_max_size: int = DEFAULT_BATCH_MAX_SIZE, batch_max_wait: float = DEFAULT_BATCH_MAX_WAIT):
+        # プロンプトローダーとGeminiクライアントは初回使用時に生成する
+        self._prompt_loader: Optional[PromptLoader] = None
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.model_name = MODEL_NAME
+        
+        # 同一プロンプトの応答キャッシュ（AI_CACHE_BACKEND=none で無効）
+        self.response_cache = response_cache if response_cache is not None else create_response_cache()
+        
+        # 非同期呼び出しの設定（セマフォはイベントループごとに生成）
+        self.max_concurrency = max(1, max_concurrency)
+        self.call_timeout = call_timeout
+        self._semaphores = weakref.WeakKeyDictionary()
+        
+        # Geminiの障害・遅延時に呼び出しを止めるサーキットブレーカー
+        self.circuit_breaker = circuit_breaker if circuit_breaker is not None else CircuitBreaker()
+        self._probe_tasks = set()
+        
+        # クォータ超過（429）を避けるためのレート制限（低優先度の呼び出しから間引く）
+        self.rate_limiter = rate_limiter if rate_limiter is not None else LLMRateLimiter()
+        
+        # 同じプロンプトの同時呼び出しは1回のGemini呼び出しにまとめる
+        self.single_flight = SingleFlight()
+        
+        # 有効時は BATCHED_CALL_KINDS の呼び出しを abatch でまとめて実行する
+        self.batcher = MicroBatcher(self._call_model_batch, batch_max_size, batch_max_wait) if batch_enabled else None
         
         # 環境変数の詳細確認
         google_api_key = os.getenv("GOOGLE_API_KEY")
         
-        print("🤖 AI Service Initialization:")
-        print(f"   LANGCHAIN_AVAILABLE: {LANGCHAIN_AVAILABLE}")
-        print(f"   API Key exists: {google_api_key is not None}")
-        print(f"   API Key length: {len(google_api_key) if google_api_key else 0}")
-        print(f"   API Key valid format: {google_api_key and len(google_api_key) > 20 if google_api_key else False}")
+        logger.info("🤖 AI Service Initialization: LANGCHAIN_AVAILABLE=%s, API Key exists=%s, API Key length=%d, "
+                    "API Key valid format=%s", LANGCHAIN_AVAILABLE, google_api_key is not None,
+                    len(google_api_key) if google_api_key else 0, bool(google_api_key and len(google_api_key) > 20))
         
         if LANGCHAIN_AVAILABLE and google_api_key and google_api_key != 'your_api_key_here':
-            try:
-                print("🔄 Attempting to initialize Gemini API...")
-                self.model = ChatGoogleGenerativeAI(
-                    model="gemma-3-27b-it",  # モデル名を修正
-                    google_api_key=google_api_key,
-                    temperature=1.0
-                )
-                self.enabled = True
-                print("✅ AI Service: Gemini API initialized successfully")
-                
-                # 簡単な接続テスト（起動時ではなく、必要時に実行）
-                # self.test_connection()
-                
-            except Exception as e:
-                self.model = None
-                self.enabled = False
-                print(f"❌ AI Service: Failed to initialize Gemini API: {str(e)}")
-                print(f"   Error type: {type(e).__name__}")
+            self._api_key = google_api_key
+            self.enabled = True
+            logger.info("✅ AI Service: Gemini API configured (client is created on first use)")
         else:
-            self.model = None
+            self._api_key = None
             self.enabled = False
             reasons = []
             if not LANGCHAIN_AVAILABLE:
@@ -62,7 +118,247 @@ class AIRecommendationService:
             elif google_api_key == 'your_api_key_here':
                 reasons.append("Placeholder API key")
             
-            print(f"⚠️ AI Service disabled: {', '.join(reasons)}")
+            logger.warning("⚠️ AI Service disabled: %s", ', '.join(reasons))
+    
+    @property
+    def prompt_loader(self) -> PromptLoader:
+        """プロンプトローダー（初回アクセス時に生成）"""
+        if self._prompt_loader is None:
+            self._prompt_loader = PromptLoader()
+        return self._prompt_loader
+    
+    @property
+    def model(self):
+        """Geminiクライアント（初回アクセス時にLangChainを読み込んで生成、失敗時はNone）"""
+        if self._model is None and self.enabled:
+            with self._model_lock:
+                if self._model is None and self.enabled:
+                    self._model = self._create_model()
+        return self._model
+    
+    @model.setter
+    def model(self, value) -> None:
+        self._model = value
+    
+    def warm_up(self) -> None:
+        """LangChainの読み込みとクライアント生成をバックグラウンドのスレッドで先に済ませる"""
+        if self.enabled and self._model is None:
+            threading.Thread(target=lambda: (self.prompt_loader, self.model), daemon=True).start()
+    
+    def _create_model(self):
+        try:
+            logger.info("🔄 Attempting to initialize Gemini API...")
+            _import_langchain()
+            model = ChatGoogleGenerativeAI(
+                model=self.model_name,
+                google_api_key=self._api_key,
+                temperature=1.0
+            )
+            logger.info("✅ AI Service: Gemini API initialized successfully")
+            return model
+        except Exception as e:
+            self.enabled = False
+            logger.error("❌ AI Service: Failed to initialize Gemini API: %s %s", type(e).__name__, e)
+            return None
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """現在のイベントループ用の同時実行セマフォを取得"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+    
+    @property
+    def available(self) -> bool:
+        """AI呼び出しを行える状態か（無効またはブレーカーが開いている場合はFalse）"""
+        return self.enabled and self._check_circuit()
+    
+    def _check_circuit(self) -> bool:
+        """ブレーカーが閉じていればTrue。開いている場合は必要に応じて試験接続を開始する"""
+        if self.circuit_breaker.allow():
+            return True
+        if self.circuit_breaker.try_begin_probe():
+            self._start_probe()
+        return False
+    
+    def _start_probe(self) -> None:
+        """試験接続をバックグラウンドで実行（call_timeout で打ち切る）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            def probe():
+                self.circuit_breaker.record_probe(self._run_sync(self._probe_connection()))
+            threading.Thread(target=probe, daemon=True).start()
+            return
+        task = loop.create_task(self._probe_connection())
+        self._probe_tasks.add(task)
+        task.add_done_callback(self._probe_tasks.discard)
+        task.add_done_callback(lambda done: self.circuit_breaker.record_probe(not done.cancelled() and done.result()))
+    
+    async def _probe_connection(self) -> bool:
+        """lazy_test_connection の非同期版（応答が call_timeout を超えたら失敗）"""
+        if not self.enabled:
+            return False
+        
+        try:
+            model = self.model
+            message = HumanMessage(content="test")
+            await asyncio.wait_for(model.ainvoke([message]), timeout=self.call_timeout)
+            return True
+        except Exception as e:
+            logger.warning("AI connection probe failed: %r", e)
+            return False
+    
+    async def _ainvoke(self, prompt: str, kind: str = "recommendation") -> str:
+        """同時実行数とタイムアウトを制御してモデルを非同期で呼び出す
+
+        kind は呼び出し種別（レート制限の優先度と間引き回数の集計に使用）。
+        """
+        if self.response_cache is not None:
+            cached = self.response_cache.get(prompt, self.model_name)
+            if cached is not None:
+                AI_CALLS.inc(kind=kind, outcome="cache_hit")
+                return cached
+        
+        key = ResponseCache.make_key(prompt, self.model_name)
+        return await self.single_flight.do(key, lambda: self._invoke_upstream(prompt, kind))
+    
+    async def _invoke_upstream(self, prompt: str, kind: str) -> str:
+        """ブレーカー・レート制限・同時実行数の制御を通してモデルを1回呼び出す"""
+        estimated_tokens = self._admit(prompt, kind)
+        
+        try:
+            if self.batcher is not None and kind in BATCHED_CALL_KINDS:
+                content = await self.batcher.submit(prompt)
+            else:
+                content = await self._call_model(prompt)
+        except Exception:
+            AI_CALLS.inc(kind=kind, outcome="failure")
+            raise
+        AI_CALLS.inc(kind=kind, outcome="success")
+        self.rate_limiter.settle(estimated_tokens, prompt, content)
+        
+        if self.response_cache is not None:
+            self.response_cache.set(prompt, self.model_name, content)
+        return content
+    
+    def _admit(self, prompt: str, kind: str) -> int:
+        """ブレーカーとレート制限を通過した呼び出しの見積もりトークン数を返す（通過できなければ例外）"""
+        if not self._check_circuit():
+            AI_CALLS.inc(kind=kind, outcome="circuit_open")
+            raise CircuitOpenError("AI circuit is open")
+        try:
+            return self.rate_limiter.acquire(kind, prompt)
+        except RateLimitedError:
+            AI_CALLS.inc(kind=kind, outcome="shed")
+            raise
+    
+    async def _call_model(self, prompt: str) -> str:
+        """モデルを1回呼び出し、結果をブレーカーに記録する"""
+        model = self.model
+        message = HumanMessage(content=prompt)
+        async with self._get_semaphore():
+            started = time.monotonic()
+            try:
+                response = await asyncio.wait_for(model.ainvoke([message]), timeout=self.call_timeout)
+            except Exception:
+                self.circuit_breaker.record_failure(time.monotonic() - started)
+                raise
+            finally:
+                STAGE_SECONDS.observe(time.monotonic() - started, stage="model_invoke")
+            self.circuit_breaker.record_success(time.monotonic() - started)
+        return response.content
+    
+    async def _call_model_batch(self, prompts: List[str]) -> List[Any]:
+        """複数のプロンプトを abatch で1回にまとめて呼び出す（失敗した要素は例外オブジェクトで返す）"""
+        model = self.model
+        messages = [[HumanMessage(content=prompt)] for prompt in prompts]
+        async with self._get_semaphore():
+            started = time.monotonic()
+            try:
+                responses = await asyncio.wait_for(
+                    model.abatch(messages, return_exceptions=True), timeout=self.call_timeout
+                )
+            except Exception:
+                latency = time.monotonic() - started
+                for _ in prompts:
+                    self.circuit_breaker.record_failure(latency)
+                raise
+            finally:
+                STAGE_SECONDS.observe(time.monotonic() - started, stage="model_batch_invoke")
+            latency = time.monotonic() - started
+        
+        results = []
+        for response in responses:
+            if isinstance(response, Exception):
+                self.circuit_breaker.record_failure(latency)
+                results.append(response)
+            else:
+                self.circuit_breaker.record_success(latency)
+                results.append(response.content)
+        return results
+    
+    async def _astream(self, prompt: str, kind: str = "recommendation") -> AsyncIterator[str]:
+        """モデルのストリーミングAPIでテキストのチャンクを順次返す（キャッシュ済みなら一度に返す）"""
+        if self.response_cache is not None:
+            cached = self.response_cache.get(prompt, self.model_name)
+            if cached is not None:
+                AI_CALLS.inc(kind=kind, outcome="cache_hit")
+                yield cached
+                return
+        
+        estimated_tokens = self._admit(prompt, kind)
+        
+        model = self.model
+        message = HumanMessage(content=prompt)
+        chunks = []
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            deadline = started + self.call_timeout
+            stream = model.astream([message]).__aiter__()
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout=max(deadline - loop.time(), 0))
+                    except StopAsyncIteration:
+                        break
+                    except Exception:
+                        self.circuit_breaker.record_failure(loop.time() - started)
+                        AI_CALLS.inc(kind=kind, outcome="failure")
+                        raise
+                    if chunk.content:
+                        chunks.append(chunk.content)
+                        yield chunk.content
+            finally:
+                await stream.aclose()
+                STAGE_SECONDS.observe(loop.time() - started, stage="model_stream")
+            self.circuit_breaker.record_success(loop.time() - started)
+        AI_CALLS.inc(kind=kind, outcome="success")
+        content = "".join(chunks)
+        self.rate_limiter.settle(estimated_tokens, prompt, content)
+        
+        if self.response_cache is not None:
+            self.response_cache.set(prompt, self.model_name, content)
+    
+    async def _astream_fields(self, prompt: str, parser: IncrementalJSONParser, kind: str) -> AsyncIterator[Dict]:
+        """ストリーミング出力をパースし、完成したフィールドごとにイベントを返す"""
+        async for chunk in self._astream(prompt, kind):
+            for field, value in parser.feed(chunk):
+                yield {"event": "field", "field": field, "value": value}
+    
+    def _run_sync(self, coro: Awaitable[T]) -> T:
+        """非同期メソッドを同期コードから実行する"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        
+        # イベントループ内から呼ばれた場合は別スレッドのループで実行
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coro).result()
     
     def test_connection_endpoint(self) -> dict:
         """デバッグ用の接続テストエンドポイント"""
@@ -75,13 +371,14 @@ class AIRecommendationService:
             }
         
         try:
+            model = self.model
             message = HumanMessage(content="Hello, test connection")
-            response = self.model.invoke([message])
+            response = model.invoke([message])
             return {
                 "status": "success",
                 "message": "AI service is working",
                 "response_length": len(response.content),
-                "model_name": "gemma-3-27b-it",
+                "model_name": self.model_name,
             }
         except Exception as e:
             return {
@@ -97,39 +394,68 @@ class AIRecommendationService:
             return False
         
         try:
+            model = self.model
             message = HumanMessage(content="test")
-            response = self.model.invoke([message])
+            response = model.invoke([message])
             return True
         except Exception as e:
-            print(f"AI connection test failed: {str(e)}")
+            logger.warning("AI connection test failed: %s", e)
             return False
 
     def enhance_challenge_with_ai(self, challenge: Dict, user_analysis: Dict, user_experiences: List[Dict] = None) -> Dict:
+        """AIでチャレンジを強化・パーソナライズ（同期版）"""
+        return self._run_sync(self.aenhance_challenge_with_ai(challenge, user_analysis, user_experiences))
+
+    async def aenhance_challenge_with_ai(self, challenge: Dict, user_analysis: Dict, user_experiences: List[Dict] = None) -> Dict:
         """AIでチャレンジを強化・パーソナライズ"""
         if not self.enabled:
             return challenge
         
         try:
             # プロンプトローダーを使用してプロンプトを構築
-            prompt = self.prompt_loader.format_challenge_enhancement_prompt(
-                challenge=challenge,
-                user_analysis=user_analysis,
-                user_experiences=user_experiences or []
-            )
-            print(prompt)
+            prompt = self._enhancement_prompt(challenge, user_analysis, user_experiences)
+            logger.debug("🤖 Enhancement prompt: %s", prompt)
             
             # LangChainでAI生成
-            message = HumanMessage(content=prompt)
-            response = self.model.invoke([message])
+            content = await self._ainvoke(prompt, "enhancement")
             
-            if response.content:
-                ai_enhancement = self._parse_ai_response(response.content)
+            if content:
+                ai_enhancement = self._parse_ai_response(content)
                 return self._merge_ai_enhancement(challenge, ai_enhancement)
         except Exception as e:
-            print(f"🤖 AI Enhancement failed: {str(e)}")
+            logger.warning("🤖 AI Enhancement failed: %s %s", type(e).__name__, e)
         
         return challenge
 
+    def _enhancement_prompt(self, challenge: Dict, user_analysis: Dict, user_experiences: Optional[List[Dict]]) -> str:
+        with STAGE_SECONDS.time(stage="prompt_format"):
+            return self.prompt_loader.format_challenge_enhancement_prompt(
+                challenge=challenge,
+                user_analysis=user_analysis,
+                user_experiences=user_experiences or []
+            )
+
+    async def astream_challenge_enhancement(self, challenge: Dict, user_analysis: Dict,
+                                            user_experiences: List[Dict] = None) -> AsyncIterator[Dict]:
+        """チャレンジ強化のストリーミング版
+
+        enhanced_description / encouragement / tips などが完成するたびに
+        {"event": "field"} を返し、最後に強化済みチャレンジを {"event": "done"} で返す。
+        """
+        result = challenge
+        if self.enabled:
+            parser = IncrementalJSONParser()
+            try:
+                prompt = self._enhancement_prompt(challenge, user_analysis, user_experiences)
+                async for event in self._astream_fields(prompt, parser, "enhancement"):
+                    yield event
+                ai_enhancement = self._parse_ai_response(parser.text)
+                if ai_enhancement:
+                    result = self._merge_ai_enhancement(challenge, ai_enhancement)
+            except Exception as e:
+                logger.warning("🤖 AI Enhancement stream failed: %s %s", type(e).__name__, e)
+        yield {"event": "done", "data": result}
+
     def generate_personalized_description(self, challenge: Dict, user_context: Dict) -> str:
         """ユーザーコンテキストに基づいた説明文を生成"""
         if not self.enabled:
@@ -147,78 +473,116 @@ class AIRecommendationService:
             日本語で回答してください。
             """
             
+            model = self.model
             message = HumanMessage(content=prompt)
-            response = self.model.invoke([message])
+            response = model.invoke([message])
             
             if response.content:
                 return response.content.strip()
                 
         except Exception as e:
-            print(f"🤖 AI Description generation failed: {str(e)}")
+            logger.warning("🤖 AI Description generation failed: %s", e)
         
         return challenge.get('description', '')
     
     def generate_ai_recommendation(self, user_preferences: Dict, user_experiences: List[Dict], level: int = 2) -> Optional[Dict]:
+        """詳細なプロンプトテンプレートを使用したレコメンデーション生成（同期版）"""
+        return self._run_sync(self.agenerate_ai_recommendation(user_preferences, user_experiences, level))
+
+    async def agenerate_ai_recommendation(self, user_preferences: Dict, user_experiences: List[Dict], level: int = 2) -> Optional[Dict]:
         """詳細なプロンプトテンプレートを使用したレコメンデーション生成"""
         if not self.enabled:
             return None
         
         try:
-            # プロンプトローダーを使用してレコメンデーションプロンプトを構築
+            prompt = self._recommendation_prompt(user_preferences, user_experiences, level)
+            content = await self._ainvoke(prompt, "recommendation")
+            
+            if content:
+                return self._finalize_recommendation(self._parse_ai_response(content), level)
+        except Exception as e:
+            logger.warning("🤖 AI Recommendation generation failed: %s %s", type(e).__name__, e)
+        
+        return None
+
+    async def astream_ai_recommendation(self, user_preferences: Dict, user_experiences: List[Dict],
+                                        level: int = 2) -> AsyncIterator[Dict]:
+        """レコメンデーション生成のストリーミング版
+
+        title / description などが完成するたびに {"event": "field"} を返し、
+        最後に通常版と同じ結果（失敗時はNone）を {"event": "done"} で返す。
+        """
+        result = None
+        if self.enabled:
+            parser = IncrementalJSONParser()
+            try:
+                prompt = self._recommendation_prompt(user_preferences, user_experiences, level)
+                async for event in self._astream_fields(prompt, parser, "recommendation"):
+                    yield event
+                result = self._finalize_recommendation(self._parse_ai_response(parser.text), level)
+            except Exception as e:
+                logger.warning("🤖 AI Recommendation stream failed: %s %s", type(e).__name__, e)
+        yield {"event": "done", "data": result}
+
+    def _recommendation_prompt(self, user_preferences: Dict, user_experiences: List[Dict], level: int) -> str:
+        """プロンプトローダーを使用してレコメンデーションプロンプトを構築"""
+        with STAGE_SECONDS.time(stage="prompt_format"):
             prompt = self.prompt_loader.format_recommendation_prompt(
                 interests=user_preferences.get('interests', []),
                 avoid_categories=user_preferences.get('avoidCategories', []),
                 level=level,
                 recent_experiences=user_experiences[-10:] if user_experiences else []
             )
-            
-            print(f"🤖 Generated recommendation prompt (length: {len(prompt)})")
-            
-            message = HumanMessage(content=prompt)
-            response = self.model.invoke([message])
-            
-            if response.content:
-                recommendation = self._parse_ai_response(response.content)
-                if recommendation:
-                    # レコメンデーション用の追加フィールドを設定
-                    recommendation.update({
-                        "level": level,
-                        "ai_generated": True,
-                        "generated_at": datetime.now().isoformat(),
-                        "recommendation_type": "ai_personalized"
-                    })
-                    print(f"✅ AI recommendation generated: {recommendation.get('title', 'Unknown')}")
-                    return recommendation
-        except Exception as e:
-            print(f"🤖 AI Recommendation generation failed: {str(e)}")
-        
-        return None
+        logger.debug("🤖 Generated recommendation prompt (length: %d)", len(prompt))
+        return prompt
+
+    def _finalize_recommendation(self, recommendation: Dict, level: int) -> Optional[Dict]:
+        """レコメンデーション用の追加フィールドを設定"""
+        if not recommendation:
+            return None
+        recommendation.update({
+            "level": level,
+            "ai_generated": True,
+            "generated_at": datetime.now().isoformat(),
+            "recommendation_type": "ai_personalized"
+        })
+        logger.debug("✅ AI recommendation generated: %s", recommendation.get('title', 'Unknown'))
+        return recommendation
 
     def suggest_custom_challenge(self, user_preferences: Dict, user_experiences: List[Dict], level: int) -> Optional[Dict]:
+        """完全カスタムチャレンジをAIで生成（同期版）"""
+        return self._run_sync(self.asuggest_custom_challenge(user_preferences, user_experiences, level))
+
+    async def asuggest_custom_challenge(self, user_preferences: Dict, user_experiences: List[Dict], level: int) -> Optional[Dict]:
         """完全カスタムチャレンジをAIで生成"""
         if not self.enabled:
             return None
         
         try:
             # プロンプトローダーを使用してプロンプトを構築
-            prompt = self.prompt_loader.format_custom_challenge_prompt(
-                user_preferences=user_preferences,
-                user_experiences=user_experiences,
-                level=level
-            )
+            with STAGE_SECONDS.time(stage="prompt_format"):
+                prompt = self.prompt_loader.format_custom_challenge_prompt(
+                    user_preferences=user_preferences,
+                    user_experiences=user_experiences,
+                    level=level
+                )
             
-            message = HumanMessage(content=prompt)
-            response = self.model.invoke([message])
+            content = await self._ainvoke(prompt, "custom_challenge")
             
-            if response.content:
-                return self._parse_custom_challenge(response.content, level)
+            if content:
+                return self._parse_custom_challenge(content, level)
                 
         except Exception as e:
-            print(f"🤖 Custom challenge generation failed: {str(e)}")
+            logger.warning("🤖 Custom challenge generation failed: %s %s", type(e).__name__, e)
             return None
 
     def _parse_ai_response(self, response_text: str) -> Dict:
         """AI応答をパース"""
+        with STAGE_SECONDS.time(stage="parse_ai_response"):
+            return self._extract_json(response_text)
+    
+    def _extract_json(self, response_text: str) -> Dict:
+        """AI応答からJSON部分を取り出して読み込む（失敗時は空の辞書）"""
         try:
             # JSON部分を抽出
             response_text = response_text.strip()
@@ -232,14 +596,13 @@ class AIRecommendationService:
                 return json.loads(json_text)
             else:
                 # JSONが見つからない場合の処理
-                print(f"🤖 No JSON found in response: {response_text[:100]}...")
+                logger.warning("🤖 No JSON found in response: %s...", response_text[:100])
                 return {}
                 
         except json.JSONDecodeError as e:
-            print(f"🤖 JSON parsing failed: {str(e)}")
-            print(f"🤖 Response text: {response_text[:200]}...")
+            logger.warning("🤖 JSON parsing failed: %s / Response text: %s...", e, response_text[:200])
         except Exception as e:
-            print(f"🤖 AI response parsing failed: {str(e)}")
+            logger.warning("🤖 AI response parsing failed: %s", e)
         
         return {}
     
@@ -286,8 +649,9 @@ class AIRecommendationService:
             return {"status": "disabled", "message": "AI service is not enabled"}
         
         try:
+            model = self.model
             message = HumanMessage(content="こんにちは！動作確認です。")
-            response = self.model.invoke([message])
+            response = model.invoke([message])
             return {
                 "status": "success", 
                 "message": "AI service is working",
@@ -296,7 +660,11 @@ class AIRecommendationService:
         except Exception as e:
             return {"status": "error", "message": f"AI service test failed: {str(e)}"}
             
-    def analyze_growth_pattern(self, experiences: List[Dict]) -> Dict:
+    def analyze_growth_pattern(self, experiences: List[Dict], user_analysis: Dict = None) -> Dict:
+        """成長パターンをAIで分析（同期版）"""
+        return self._run_sync(self.aanalyze_growth_pattern(experiences, user_analysis))
+
+    async def aanalyze_growth_pattern(self, experiences: List[Dict], user_analysis: Dict = None) -> Dict:
         """成長パターンをAIで分析"""
         if not self.enabled:
             return {
@@ -306,23 +674,54 @@ class AIRecommendationService:
         
         try:
             # プロンプトローダーを使用してプロンプトを構築
-            prompt = self.prompt_loader.format_growth_analysis_prompt(experiences=experiences)
+            with STAGE_SECONDS.time(stage="prompt_format"):
+                prompt = self.prompt_loader.format_growth_analysis_prompt(
+                    experiences=experiences,
+                    user_analysis=user_analysis or {}
+                )
             
-            message = HumanMessage(content=prompt)
-            response = self.model.invoke([message])
+            content = await self._ainvoke(prompt, "growth_analysis")
             
-            if response.content:
-                return self._parse_ai_response(response.content)
+            if content:
+                return self._parse_ai_response(content)
                 
         except Exception as e:
-            print(f"AI analysis error: {str(e)}")
-            return {
-                "insights": ["分析中にエラーが発生しました"],
-                "next_challenge_areas": ["様々な分野への挑戦"],
-                "summary": "基本的な成長パターンを継続中",
-                "encouragement": "新しい体験を続けていきましょう",
-                "growth_stage": "developing"
-            }
+            logger.warning("AI analysis error: %s %s", type(e).__name__, e)
+            return self._growth_error_response()
+
+    async def astream_growth_pattern(self, experiences: List[Dict], user_analysis: Dict = None) -> AsyncIterator[Dict]:
+        """成長パターン分析のストリーミング版
+
+        insights / summary などが完成するたびに {"event": "field"} を返し、
+        最後に通常版と同じ結果を {"event": "done"} で返す。
+        """
+        if not self.enabled:
+            yield {"event": "done", "data": await self.aanalyze_growth_pattern(experiences, user_analysis)}
+            return
+        
+        parser = IncrementalJSONParser()
+        try:
+            with STAGE_SECONDS.time(stage="prompt_format"):
+                prompt = self.prompt_loader.format_growth_analysis_prompt(
+                    experiences=experiences,
+                    user_analysis=user_analysis or {}
+                )
+            async for event in self._astream_fields(prompt, parser, "growth_analysis"):
+                yield event
+            result = self._parse_ai_response(parser.text)
+        except Exception as e:
+            logger.warning("AI analysis stream error: %s %s", type(e).__name__, e)
+            result = self._growth_error_response()
+        yield {"event": "done", "data": result}
+
+    def _growth_error_response(self) -> Dict:
+        return {
+            "insights": ["分析中にエラーが発生しました"],
+            "next_challenge_areas": ["様々な分野への挑戦"],
+            "summary": "基本的な成長パターンを継続中",
+            "encouragement": "新しい体験を続けていきましょう",
+            "growth_stage": "developing"
+        }
 
     def _safe_json_parse(self, content: str) -> Dict:
         """安全なJSON解析"""
@@ -336,7 +735,7 @@ class AIRecommendationService:
             
             return json.loads(content)
         except Exception as e:
-            print(f"JSON parse error: {str(e)}")
+            logger.warning("JSON parse error: %s", e)
             return {}
 
     def _create_fallback_response(self, challenge_type: str = "general") -> Dict:
@@ -0,0 +1,93 @@
+# レベル別チャレンジインデックス（起動時に一度だけ構築）
+import random
+from typing import Dict, List, Iterable, Optional
+
+import numpy as np
+
+
+class LevelIndex:
+    """1レベル分のチャレンジを連続配列として保持"""
+
+    def __init__(self, challenges: List[Dict], category_ids: Dict[str, int]):
+        self.challenges = challenges
+        self.base_scores = np.array(
+            [challenge.get('serendipity_score', 0.5) for challenge in challenges], dtype=np.float64
+        )
+        self.category_ids = np.array(
+            [category_ids[challenge.get('category', '')] for challenge in challenges], dtype=np.int64
+        )
+        # 各チャレンジのカテゴリーを1ビットで表したマスク
+        self.category_bits = np.left_shift(np.int64(1), self.category_ids)
+
+    def __len__(self) -> int:
+        return len(self.challenges)
+
+
+class ChallengeIndex:
+    """スコア計算と重み付き選択をベクトル演算で行うためのインデックス"""
+
+    MAX_CATEGORIES = 63
+
+    def __init__(self, challenges_db: Dict[int, List[Dict]], category_metadata: Dict[str, Dict]):
+        # カテゴリーIDを割り当て（メタデータにないカテゴリーも含める）
+        categories = list(category_metadata.keys())
+        for challenges in challenges_db.values():
+            for challenge in challenges:
+                category = challenge.get('category', '')
+                if category not in categories:
+                    categories.append(category)
+        if len(categories) > self.MAX_CATEGORIES:
+            raise ValueError(f"Too many categories for bitmask index: {len(categories)}")
+
+        self.categories = categories
+        self.category_ids = {category: i for i, category in enumerate(categories)}
+        self.levels = {
+            level: LevelIndex(challenges, self.category_ids)
+            for level, challenges in challenges_db.items()
+        }
+
+    def get_level(self, level: int) -> Optional[LevelIndex]:
+        return self.levels.get(level)
+
+    def category_mask(self, categories: Iterable[str]) -> int:
+        """カテゴリー集合をビットマスクに変換（未知のカテゴリーは無視）"""
+        mask = 0
+        for category in categories:
+            category_id = self.category_ids.get(category)
+            if category_id is not None:
+                mask |= 1 << category_id
+        return mask
+
+    def score(self, level_index: LevelIndex, user_analysis: Dict, preferences: Dict) -> np.ndarray:
+        """_calculate_anti_optimization_score と同じ規則でレベル内の全チャレンジを一括採点"""
+        bits = level_index.category_bits
+        avoided = (bits & self.category_mask(user_analysis.get('avoided_categories', []))) != 0
+        favorite = (bits & self.category_mask(user_analysis.get('favorite_categories', []))) != 0
+        recent = (bits & self.category_mask(user_analysis.get('recent_categories', []))) != 0
+        user_avoid = (bits & self.category_mask(preferences.get('avoidCategories', []))) != 0
+
+        scores = level_index.base_scores.copy()
+
+        # 新しいカテゴリーへのボーナス
+        scores += np.where(avoided, 0.3, np.where(favorite, 0.0, 0.1))
+
+        # 多様性ボーナス
+        if user_analysis.get('diversity_score', 0) < 0.7:
+            scores += 0.2
+
+        # 最近の体験との重複ペナルティとユーザー設定による調整
+        scores -= np.where(recent, 0.2, 0.0)
+        scores -= np.where(user_avoid, 0.4, 0.0)
+
+        return np.clip(scores, 0.0, 1.0)
+
+    def weighted_random_index(self, scores: np.ndarray) -> int:
+        """累積和の二分探索による重み付きランダム選択"""
+        cumulative = np.cumsum(scores)
+        total_weight = float(cumulative[-1])
+        if total_weight == 0:
+            return random.randrange(len(scores))
+
+        rand = random.uniform(0, total_weight)
+        index = int(np.searchsorted(cumulative, rand, side='left'))
+        return min(index, len(scores) - 1)
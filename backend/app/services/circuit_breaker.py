@@ -0,0 +1,128 @@
+# 外部API呼び出し用のサーキットブレーカー
+import logging
+import os
+import time
+import threading
+from collections import deque
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# ブレーカー設定（環境変数で変更可能）
+DEFAULT_FAILURE_RATE = float(os.getenv("AI_BREAKER_FAILURE_RATE", "0.5"))       # 開く失敗率（遅い呼び出しも失敗扱い）
+DEFAULT_SLOW_CALL_SECONDS = float(os.getenv("AI_BREAKER_SLOW_CALL_SECONDS", "10"))
+DEFAULT_WINDOW_SIZE = int(os.getenv("AI_BREAKER_WINDOW", "20"))                 # 直近何回の呼び出しで判定するか
+DEFAULT_MIN_CALLS = int(os.getenv("AI_BREAKER_MIN_CALLS", "5"))
+DEFAULT_OPEN_SECONDS = float(os.getenv("AI_BREAKER_OPEN_SECONDS", "30"))        # 開いてから試験呼び出しまでの時間
+DEFAULT_PROBE_SECONDS = float(os.getenv("AI_BREAKER_PROBE_SECONDS", "30"))      # 試験呼び出しの結果を待つ上限
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """ブレーカーが開いているため呼び出しを行わなかった"""
+
+
+class CircuitBreaker:
+    """直近の呼び出しの失敗率・遅延からブレーカーを開閉する
+
+    closed: 全て通す。直近 window_size 回のうち失敗（または slow_call_seconds 超え）の割合が
+            failure_rate 以上になると open。
+    open: 全て即座に拒否。open_seconds 経過後に1回だけ試験呼び出し（half_open）を許可する。
+    half_open: 試験呼び出しが成功すれば closed、失敗すれば再び open。probe_seconds 以内に
+               結果が届かない場合も失敗とみなして open に戻す。
+    """
+
+    def __init__(self, failure_rate: float = DEFAULT_FAILURE_RATE, slow_call_seconds: float = DEFAULT_SLOW_CALL_SECONDS,
+                 window_size: int = DEFAULT_WINDOW_SIZE, min_calls: int = DEFAULT_MIN_CALLS,
+                 open_seconds: float = DEFAULT_OPEN_SECONDS, probe_seconds: float = DEFAULT_PROBE_SECONDS):
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = max(1, min_calls)
+        self.open_seconds = open_seconds
+        self.probe_seconds = probe_seconds
+        self._window = deque(maxlen=max(1, window_size))  # (失敗か, 遅延秒)
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        self._probe_started_at = 0.0
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """呼び出しを通してよいか（open中は即座にFalse）"""
+        with self._lock:
+            if self._state == STATE_CLOSED:
+                return True
+            self.rejected += 1
+            return False
+
+    def try_begin_probe(self) -> bool:
+        """open_seconds 経過後、試験呼び出しを1回だけ開始できる（half_openへ移行）"""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == STATE_HALF_OPEN and now - self._probe_started_at >= self.probe_seconds:
+                # 試験呼び出しが応答しないまま期限を過ぎた
+                self._open()
+                return False
+            if self._state != STATE_OPEN or now - self._opened_at < self.open_seconds:
+                return False
+            self._state = STATE_HALF_OPEN
+            self._probe_started_at = now
+            return True
+
+    def record_probe(self, success: bool) -> None:
+        """試験呼び出しの結果を反映"""
+        with self._lock:
+            if self._state != STATE_HALF_OPEN:
+                return
+            if success:
+                self._state = STATE_CLOSED
+                self._window.clear()
+                logger.info("✅ AI circuit closed")
+            else:
+                self._open()
+
+    def record_success(self, latency: float) -> None:
+        self._record(latency > self.slow_call_seconds, latency)
+
+    def record_failure(self, latency: float = 0.0) -> None:
+        self._record(True, latency)
+
+    def _record(self, failed: bool, latency: float) -> None:
+        with self._lock:
+            if self._state != STATE_CLOSED:
+                return
+            self._window.append((failed, latency))
+            if len(self._window) < self.min_calls:
+                return
+            failures = sum(1 for is_failure, _ in self._window if is_failure)
+            if failures / len(self._window) >= self.failure_rate:
+                self._open()
+
+    def _open(self) -> None:
+        self._state = STATE_OPEN
+        self._opened_at = time.monotonic()
+        self.opened += 1
+        logger.warning("⚠️ AI circuit opened for %.0fs", self.open_seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            window = list(self._window)
+        latencies = sorted(latency for _, latency in window)
+        return {
+            "state": self.state,
+            "window_calls": len(window),
+            "window_failures": sum(1 for failed, _ in window if failed),
+            "window_p50_latency": latencies[len(latencies) // 2] if latencies else None,
+            "window_max_latency": latencies[-1] if latencies else None,
+            "opened": self.opened,
+            "rejected": self.rejected
+        }
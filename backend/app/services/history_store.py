@@ -0,0 +1,310 @@
+# ユーザー体験履歴のサーバーサイド永続化ストア
+import logging
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .sqlite_utils import connect_sqlite, reopen_after_fork
+
+logger = logging.getLogger(__name__)
+
+# Supabaseクライアント（任意）
+try:
+    from supabase import create_client
+    SUPABASE_AVAILABLE = True
+except ImportError:
+    SUPABASE_AVAILABLE = False
+
+# ストア設定（環境変数で変更可能）
+DEFAULT_HISTORY_BACKEND = os.getenv("HISTORY_STORE_BACKEND", "sqlite")  # sqlite / supabase
+DEFAULT_HISTORY_PATH = os.getenv("HISTORY_DB_PATH", "user_history.sqlite3")
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_experiences (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    experience_id TEXT,
+    category TEXT,
+    completed INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    UNIQUE (user_id, experience_id)
+);
+CREATE INDEX IF NOT EXISTS idx_user_experiences_user_seq ON user_experiences (user_id, seq);
+
+CREATE TABLE IF NOT EXISTS user_category_counts (
+    user_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, category)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_user_experiences_count
+AFTER INSERT ON user_experiences
+BEGIN
+    INSERT INTO user_category_counts (user_id, category, count)
+    VALUES (NEW.user_id, COALESCE(NEW.category, 'その他'), 1)
+    ON CONFLICT (user_id, category) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_user_experiences_recount
+AFTER UPDATE OF category ON user_experiences
+WHEN COALESCE(OLD.category, 'その他') != COALESCE(NEW.category, 'その他')
+BEGIN
+    UPDATE user_category_counts SET count = count - 1
+    WHERE user_id = OLD.user_id AND category = COALESCE(OLD.category, 'その他');
+    DELETE FROM user_category_counts
+    WHERE user_id = OLD.user_id AND category = COALESCE(OLD.category, 'その他') AND count <= 0;
+    INSERT INTO user_category_counts (user_id, category, count)
+    VALUES (NEW.user_id, COALESCE(NEW.category, 'その他'), 1)
+    ON CONFLICT (user_id, category) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TABLE IF NOT EXISTS user_feedback (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_user_feedback_user_seq ON user_feedback (user_id, seq);
+"""
+
+
+def experience_id(experience: Dict) -> str:
+    """体験のID（IDがない場合はタイトル・日付・カテゴリーから安定したIDを作る）"""
+    value = experience.get('id')
+    if value is not None:
+        return str(value)
+    source = json.dumps(
+        [experience.get('title'), experience.get('date'), experience.get('category')], ensure_ascii=False
+    )
+    return "sha1:" + hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+
+def _experience_rows(user_id: str, experiences: List[Dict]) -> List[Dict]:
+    """体験データを保存用の行に変換（同じIDが複数ある場合は最後のものを使う）"""
+    rows = {}
+    for exp in experiences:
+        row = _experience_row(user_id, exp)
+        rows.pop(row["experience_id"], None)
+        rows[row["experience_id"]] = row
+    return list(rows.values())
+
+
+def _experience_row(user_id: str, experience: Dict) -> Dict:
+    """体験データを保存用の行に変換"""
+    return {
+        "user_id": user_id,
+        "experience_id": experience_id(experience),
+        "category": experience.get('category', 'その他'),
+        "completed": bool(experience.get('completed', False)),
+        "data": experience,
+        "created_at": datetime.now().isoformat()
+    }
+
+
+class SQLiteHistoryStore:
+    """ローカルSQLiteによる履歴ストア（同じIDの体験は上書き）"""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        reopen_after_fork(self)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """初回使用時に接続してスキーマを作成（呼び出し側で _lock を保持する）"""
+        if self._db is None:
+            self._db = connect_sqlite(self.path)
+            self._db.executescript(SQLITE_SCHEMA)
+        return self._db
+
+    def append_experiences(self, user_id: str, experiences: List[Dict]) -> Tuple[int, List[Dict], List[Dict]]:
+        """体験を追記し、最新のカーソル・新しく追加された体験・内容が更新された体験を返す
+
+        同じIDの体験が既にあれば内容を上書きする（カーソル上の位置は変わらない）。
+        """
+        inserted = []
+        updated = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for row in _experience_rows(user_id, experiences):
+                    data = json.dumps(row["data"], ensure_ascii=False)
+                    existing = self._conn.execute(
+                        "SELECT data FROM user_experiences WHERE user_id = ? AND experience_id = ?",
+                        (user_id, row["experience_id"])
+                    ).fetchone()
+                    if existing is not None and existing[0] == data:
+                        continue
+                    self._conn.execute(
+                        "INSERT INTO user_experiences"
+                        " (user_id, experience_id, category, completed, data, created_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?)"
+                        " ON CONFLICT (user_id, experience_id) DO UPDATE SET"
+                        " category = excluded.category, completed = excluded.completed, data = excluded.data",
+                        (row["user_id"], row["experience_id"], row["category"], int(row["completed"]),
+                         data, row["created_at"])
+                    )
+                    (inserted if existing is None else updated).append(row["data"])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get_cursor(user_id), inserted, updated
+
+    def get_experiences(self, user_id: str, after: int = 0, limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+        """カーソル以降の体験と新しいカーソルを取得"""
+        query = "SELECT seq, data FROM user_experiences WHERE user_id = ? AND seq > ? ORDER BY seq"
+        params: Tuple = (user_id, after)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        cursor = rows[-1][0] if rows else after
+        return [json.loads(data) for _, data in rows], cursor
+
+    def get_recent_experiences(self, user_id: str, limit: int) -> List[Dict]:
+        """最新の体験を古い順に取得"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM user_experiences WHERE user_id = ? ORDER BY seq DESC LIMIT ?",
+                (user_id, limit)
+            ).fetchall()
+        return [json.loads(data) for (data,) in reversed(rows)]
+
+    def get_cursor(self, user_id: str) -> int:
+        """ユーザーの最新カーソル"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(seq) FROM user_experiences WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row[0] or 0
+
+    def get_category_counts(self, user_id: str) -> Dict[str, int]:
+        """追記時に更新されるカテゴリー別集計を取得（カテゴリーが最初に現れた順）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT category, count FROM user_category_counts WHERE user_id = ? ORDER BY rowid", (user_id,)
+            ).fetchall()
+        return {category: count for category, count in rows}
+
+    def append_feedback(self, user_id: str, entry: Dict) -> None:
+        """フィードバックを追記"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO user_feedback (user_id, data, created_at) VALUES (?, ?, ?)",
+                (user_id, json.dumps(entry, ensure_ascii=False), datetime.now().isoformat())
+            )
+
+
+class SupabaseHistoryStore:
+    """Supabase（PostgREST）による履歴ストア
+
+    テーブルと集計トリガーは supabase/migrations の定義を使用する。
+    """
+
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None, client=None):
+        if client is None:
+            if not SUPABASE_AVAILABLE:
+                raise RuntimeError("supabase package is not installed")
+            client = create_client(url or os.getenv("SUPABASE_URL"), key or os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
+        self.client = client
+
+    def append_experiences(self, user_id: str, experiences: List[Dict]) -> Tuple[int, List[Dict], List[Dict]]:
+        rows = _experience_rows(user_id, experiences)
+        inserted = []
+        updated = []
+        if rows:
+            existing = (
+                self.client.table("user_experiences")
+                .select("experience_id,data")
+                .eq("user_id", user_id)
+                .in_("experience_id", [row["experience_id"] for row in rows])
+                .execute()
+                .data
+            ) or []
+            existing = {row["experience_id"]: row["data"] for row in existing}
+            # 内容が変わらない行は送らない（created_at は追加時の既定値を使い、更新では変えない）
+            rows = [
+                {key: value for key, value in row.items() if key != "created_at"}
+                for row in rows if existing.get(row["experience_id"]) != row["data"]
+            ]
+        if rows:
+            result = self.client.table("user_experiences").upsert(
+                rows, on_conflict="user_id,experience_id"
+            ).execute()
+            for row in sorted(result.data or [], key=lambda row: row["seq"]):
+                (updated if row["experience_id"] in existing else inserted).append(row["data"])
+        return self.get_cursor(user_id), inserted, updated
+
+    def get_experiences(self, user_id: str, after: int = 0, limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+        query = (
+            self.client.table("user_experiences")
+            .select("seq,data")
+            .eq("user_id", user_id)
+            .gt("seq", after)
+            .order("seq")
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        rows = query.execute().data or []
+        cursor = rows[-1]["seq"] if rows else after
+        return [row["data"] for row in rows], cursor
+
+    def get_recent_experiences(self, user_id: str, limit: int) -> List[Dict]:
+        rows = (
+            self.client.table("user_experiences")
+            .select("data")
+            .eq("user_id", user_id)
+            .order("seq", desc=True)
+            .limit(limit)
+            .execute()
+            .data
+        ) or []
+        return [row["data"] for row in reversed(rows)]
+
+    def get_cursor(self, user_id: str) -> int:
+        rows = (
+            self.client.table("user_experiences")
+            .select("seq")
+            .eq("user_id", user_id)
+            .order("seq", desc=True)
+            .limit(1)
+            .execute()
+            .data
+        )
+        return rows[0]["seq"] if rows else 0
+
+    def get_category_counts(self, user_id: str) -> Dict[str, int]:
+        rows = (
+            self.client.table("user_category_counts")
+            .select("category,count")
+            .eq("user_id", user_id)
+            .execute()
+            .data
+        ) or []
+        return {row["category"]: row["count"] for row in rows}
+
+    def append_feedback(self, user_id: str, entry: Dict) -> None:
+        self.client.table("user_feedback").insert({
+            "user_id": user_id,
+            "data": entry,
+            "created_at": datetime.now().isoformat()
+        }).execute()
+
+
+def create_history_store(backend: str = DEFAULT_HISTORY_BACKEND):
+    """設定に応じた履歴ストアを生成"""
+    if backend.lower() == "supabase":
+        try:
+            return SupabaseHistoryStore()
+        except Exception as e:
+            logger.warning("⚠️ Supabase history store unavailable, falling back to SQLite: %s", e)
+    return SQLiteHistoryStore()
@@ -0,0 +1,109 @@
+# LLMのストリーミング出力に対するインクリメンタルJSONパーサー
+import logging
+import json
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# パーサーの状態
+_START = "start"   # 最初の { を探している
+_KEY = "key"       # キーまたは } を待っている
+_COLON = "colon"   # キーの後の : を待っている
+_VALUE = "value"   # 値の終わり（深さ0の , または }）を探している
+_END = "end"       # 最上位オブジェクトの読み取り完了
+
+
+class IncrementalJSONParser:
+    """ストリーミングされたテキストから最上位オブジェクトのフィールドを完成した順に取り出す
+
+    ```json のようなコードブロックや前置きの文章は、最初の { まで読み飛ばす。
+    値が完成した（深さ0の , または } に達した）時点で json.loads し、(キー, 値) を返す。
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.fields: Dict[str, Any] = {}
+        self._pos = 0
+        self._state = _START
+        self._key_start = 0
+        self._key = ""
+        self._value_start = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def complete(self) -> bool:
+        return self._state == _END
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """チャンクを追加し、新たに完成したフィールドを返す"""
+        self.text += chunk
+        completed = []
+        text = self.text
+        pos = self._pos
+
+        while pos < len(text) and self._state != _END:
+            char = text[pos]
+
+            if self._state == _START:
+                if char == "{":
+                    self._state = _KEY
+                pos += 1
+
+            elif self._state == _KEY:
+                if self._in_string:
+                    if self._escape:
+                        self._escape = False
+                    elif char == "\\":
+                        self._escape = True
+                    elif char == '"':
+                        self._in_string = False
+                        self._key = json.loads(text[self._key_start:pos + 1])
+                        self._state = _COLON
+                elif char == '"':
+                    self._in_string = True
+                    self._key_start = pos
+                elif char == "}":
+                    self._state = _END
+                pos += 1
+
+            elif self._state == _COLON:
+                if char == ":":
+                    self._state = _VALUE
+                    self._value_start = pos + 1
+                    self._depth = 0
+                pos += 1
+
+            else:
+                if self._in_string:
+                    if self._escape:
+                        self._escape = False
+                    elif char == "\\":
+                        self._escape = True
+                    elif char == '"':
+                        self._in_string = False
+                elif char == '"':
+                    self._in_string = True
+                elif char in "{[":
+                    self._depth += 1
+                elif char in "}]" and self._depth > 0:
+                    self._depth -= 1
+                elif char in ",}" and self._depth == 0:
+                    field = self._complete_value(text[self._value_start:pos])
+                    if field is not None:
+                        completed.append(field)
+                    self._state = _END if char == "}" else _KEY
+                pos += 1
+
+        self._pos = pos
+        return completed
+
+    def _complete_value(self, raw: str):
+        try:
+            value = json.loads(raw.strip())
+        except json.JSONDecodeError:
+            logger.warning("🤖 Skipping malformed streamed field: %s", self._key)
+            return None
+        self.fields[self._key] = value
+        return self._key, value
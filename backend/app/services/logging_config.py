@@ -0,0 +1,117 @@
+# ロギング設定（キュー経由のバックグラウンド書き込み・レベル別サンプリング・構造化出力）
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from typing import Dict, Optional
+
+# ログ設定（環境変数で変更可能）
+DEFAULT_LOG_FILE = os.getenv("LOG_FILE", "ai_service.log")            # 空文字でファイル出力なし
+DEFAULT_LOG_FORMAT = os.getenv("LOG_FORMAT", "text")                  # text / json
+DEFAULT_LOG_SAMPLE_DEBUG = float(os.getenv("LOG_SAMPLE_DEBUG", "1.0"))  # DEBUGログを出力する割合
+DEFAULT_LOG_SAMPLE_INFO = float(os.getenv("LOG_SAMPLE_INFO", "1.0"))    # INFOログを出力する割合
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# LogRecord が標準で持つ属性（これ以外は extra として構造化ログに含める）
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+class SamplingFilter(logging.Filter):
+    """WARNING未満のログをレベルごとの割合で間引く（WARNING以上は常に通す）"""
+
+    def __init__(self, rates: Dict[int, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JSONFormatter(logging.Formatter):
+    """1行1オブジェクトのJSONでログを出力"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """メッセージの整形をせずにレコードをキューへ渡す（整形はリスナーのスレッドで行う）"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(level: int = logging.INFO, log_file: str = DEFAULT_LOG_FILE, log_format: str = DEFAULT_LOG_FORMAT,
+                  sample_debug: float = DEFAULT_LOG_SAMPLE_DEBUG, sample_info: float = DEFAULT_LOG_SAMPLE_INFO) -> None:
+    """ルートロガーをキュー経由の出力に切り替える
+
+    リクエスト処理中のログ呼び出しはキューへの追加だけで戻り、標準出力・ファイルへの
+    書き込みはバックグラウンドの QueueListener が行う。複数回呼ばれた場合は設定し直す。
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+
+    formatter = JSONFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter({logging.DEBUG: sample_debug, logging.INFO: sample_info}))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _queue_handler = queue_handler
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_listener_after_fork() -> None:
+    """fork後の子プロセスではリスナーのスレッドが存在しないため、新しいキューで起動し直す"""
+    global _listener
+    if _listener is None or _queue_handler is None:
+        return
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """キューに残ったログを書き出してリスナーを停止"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
@@ -0,0 +1,86 @@
+# 短時間に届いた呼び出しをまとめて実行するマイクロバッチ・スケジューラー
+import asyncio
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+
+class _LoopBatchState:
+    """イベントループごとの待機中アイテム・フラッシュ用タイマー・実行中のバッチ"""
+
+    def __init__(self):
+        self.pending: List[Tuple[Any, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        # 実行中のタスクは完了まで参照を保持する（イベントループは弱参照しか持たない）
+        self.tasks: Set[asyncio.Task] = set()
+
+
+class MicroBatcher:
+    """submit() された呼び出しを最大 max_batch_size 件・最大 max_wait 秒まで溜めて一括実行
+
+    execute_batch は入力と同じ順序で結果を返す。結果が例外オブジェクトの場合は
+    その呼び出し元にだけ例外として届ける。
+    """
+
+    def __init__(self, execute_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_batch_size: int = 8, max_wait: float = 0.01):
+        self.execute_batch = execute_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self._states = weakref.WeakKeyDictionary()
+        self.batches = 0
+        self.items = 0
+
+    def _state(self, loop: asyncio.AbstractEventLoop) -> _LoopBatchState:
+        state = self._states.get(loop)
+        if state is None:
+            state = _LoopBatchState()
+            self._states[loop] = state
+        return state
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        state = self._state(loop)
+        future = loop.create_future()
+        state.pending.append((item, future))
+
+        if len(state.pending) >= self.max_batch_size:
+            self._flush(loop, state)
+        elif state.timer is None:
+            state.timer = loop.call_later(self.max_wait, self._flush, loop, state)
+        return await future
+
+    def _flush(self, loop: asyncio.AbstractEventLoop, state: _LoopBatchState) -> None:
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+        batch = state.pending[:self.max_batch_size]
+        state.pending = state.pending[self.max_batch_size:]
+        if state.pending:
+            state.timer = loop.call_later(self.max_wait, self._flush, loop, state)
+        if batch:
+            task = loop.create_task(self._run(batch))
+            state.tasks.add(task)
+            task.add_done_callback(state.tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = await self.execute_batch([item for item, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "average_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0
+        }
@@ -1,27 +1,35 @@
 # 完全Markdownベースプロンプトローダー
+import logging
 import os
 from typing import Dict, List, Any
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 class PromptLoader:
     """Markdownプロンプトファイルを読み込み、完全にファイルベースでプロンプトを管理"""
     
     def __init__(self):
         self.prompts_dir = Path(__file__).parent.parent / "prompts"
         self._prompt_cache = {}  # プロンプトキャッシュ
-        print(f"📄 Markdown-based Prompt Loader initialized: {self.prompts_dir}")
+        logger.info("📄 Markdown-based Prompt Loader initialized: %s", self.prompts_dir)
           # プロンプトファイルの存在確認
         self._verify_prompt_files()
     
+    def preload(self) -> None:
+        """全てのプロンプトをキャッシュに読み込む（マルチワーカー起動時はfork前に呼ぶ）"""
+        for prompt_file in sorted(self.prompts_dir.glob("*.md")):
+            self.load_prompt(prompt_file.stem)
+    
     def _verify_prompt_files(self):
         """プロンプトファイルの存在を確認"""
         required_files = ["recommendation.md", "growth_analysis.md", "challenge_enhancement.md", "custom_challenge.md"]
         for filename in required_files:
             file_path = self.prompts_dir / filename
             if file_path.exists():
-                print(f"✅ Found prompt file: {filename}")
+                logger.info("✅ Found prompt file: %s", filename)
             else:
-                print(f"❌ Missing prompt file: {filename}")
+                logger.error("❌ Missing prompt file: %s", filename)
     
     def load_prompt(self, prompt_name: str) -> str:
         """プロンプトファイルを読み込む"""
@@ -31,17 +39,17 @@ class PromptLoader:
         prompt_file = self.prompts_dir / f"{prompt_name}.md"
         
         if not prompt_file.exists():
-            print(f"⚠️ Prompt file not found: {prompt_file}")
+            logger.warning("⚠️ Prompt file not found: %s", prompt_file)
             return ""
         
         try:
             with open(prompt_file, 'r', encoding='utf-8') as f:
                 content = f.read()
                 self._prompt_cache[prompt_name] = content
-                print(f"✅ Loaded prompt: {prompt_name}")
+                logger.info("✅ Loaded prompt: %s", prompt_name)
                 return content
         except Exception as e:
-            print(f"❌ Failed to load prompt {prompt_name}: {str(e)}")
+            logger.error("❌ Failed to load prompt %s: %s", prompt_name, e)
             return ""
     
     def _format_template(self, template: str, **kwargs) -> str:
@@ -49,10 +57,10 @@ class PromptLoader:
         try:
             return template.format(**kwargs)
         except KeyError as e:
-            print(f"⚠️ Missing template variable: {e}")
+            logger.warning("⚠️ Missing template variable: %s", e)
             return template
         except Exception as e:
-            print(f"❌ Template formatting error: {str(e)}")
+            logger.error("❌ Template formatting error: %s", e)
             return template
 
     def format_recommendation_prompt(self, interests: List[str], avoid_categories: List[str], 
@@ -86,12 +94,17 @@ class PromptLoader:
             return ""
         
         # 体験履歴の要約を作成
-        experience_summary = self._create_experience_summary(kwargs.get('experiences', []))
+        user_analysis = kwargs.get('user_analysis', {})
+        experience_summary = self._create_experience_summary(
+            kwargs.get('experiences', []),
+            user_analysis.get('category_distribution'),
+            user_analysis.get('total_experiences')
+        )
         
         try:
             return template.format(experience_summary=experience_summary)
         except KeyError as e:
-            print(f"⚠️ Missing template variable: {e}")
+            logger.warning("⚠️ Missing template variable: %s", e)
             return template
     
     def format_challenge_enhancement_prompt(self, **kwargs) -> str:
@@ -104,10 +117,11 @@ class PromptLoader:
         user_analysis = kwargs.get('user_analysis', {})
         user_experiences = kwargs.get('user_experiences', [])
         
-        # 最近の体験カテゴリーを取得
-        recent_categories = []
-        if user_experiences:
-            recent_categories = list(set([exp.get('category', '') for exp in user_experiences[-5:]]))
+        # 最近の体験カテゴリーを取得（分析済みならそれを使う）
+        recent_categories = user_analysis.get('recent_categories')
+        if recent_categories is None:
+            recent_categories = [exp.get('category', '') for exp in user_experiences[-5:]]
+        recent_categories = list(dict.fromkeys(recent_categories))
         
         # デフォルト値を設定
         defaults = {
@@ -122,7 +136,7 @@ class PromptLoader:
         try:
             return template.format(**defaults)
         except KeyError as e:
-            print(f"⚠️ Missing template variable in challenge_enhancement: {e}")
+            logger.warning("⚠️ Missing template variable in challenge_enhancement: %s", e)
             return template
     
     def format_custom_challenge_prompt(self, **kwargs) -> str:
@@ -161,7 +175,7 @@ class PromptLoader:
         try:
             return template.format(**defaults)
         except KeyError as e:
-            print(f"⚠️ Missing template variable in custom_challenge: {e}")
+            logger.warning("⚠️ Missing template variable in custom_challenge: %s", e)
             return template
     
     def _get_level_description(self, level: int) -> str:
@@ -188,19 +202,20 @@ class PromptLoader:
         
         return '\n'.join(formatted)
     
-    def _create_experience_summary(self, experiences: list) -> str:
+    def _create_experience_summary(self, experiences: list, categories: dict = None, total: int = None) -> str:
         """体験履歴の要約を作成"""
         if not experiences:
             return "まだ体験履歴がありません"
         
-        # カテゴリー分布を計算
-        categories = {}
-        for exp in experiences:
-            category = exp.get('category', '不明')
-            categories[category] = categories.get(category, 0) + 1
+        # カテゴリー分布を計算（分析済みの分布があれば再利用）
+        if categories is None:
+            categories = {}
+            for exp in experiences:
+                category = exp.get('category', '不明')
+                categories[category] = categories.get(category, 0) + 1
         
         summary = f"""
-体験総数: {len(experiences)}件
+体験総数: {total if total is not None else len(experiences)}件
 
 カテゴリー分布:
 {self._format_category_distribution(categories)}
@@ -0,0 +1,146 @@
+# LLM呼び出しのレート制限（トークンバケット＋1分あたりのトークン予算）
+import os
+import math
+import time
+import threading
+from collections import deque, defaultdict
+from typing import Any, Dict
+
+# 制限設定（環境変数で変更可能、0で無効）
+# 値はサーバー全体の上限で、複数ワーカー（WEB_CONCURRENCY）では各ワーカーに等分する
+WORKER_COUNT = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+DEFAULT_REQUESTS_PER_MINUTE = float(os.getenv("AI_REQUESTS_PER_MINUTE", "30")) / WORKER_COUNT
+DEFAULT_TOKENS_PER_MINUTE = float(os.getenv("AI_TOKENS_PER_MINUTE", "15000")) / WORKER_COUNT
+DEFAULT_LOW_PRIORITY_RESERVE = float(os.getenv("AI_LOW_PRIORITY_RESERVE", "0.3"))  # 優先度の高い呼び出し用に残す割合
+DEFAULT_CHARS_PER_TOKEN = float(os.getenv("AI_CHARS_PER_TOKEN", "2"))
+DEFAULT_EXPECTED_OUTPUT_TOKENS = int(os.getenv("AI_EXPECTED_OUTPUT_TOKENS", "300"))
+
+PRIORITY_HIGH = "high"
+PRIORITY_LOW = "low"
+
+# 呼び出し種別ごとの優先度（低優先度のものから先に間引く）
+CALL_PRIORITIES = {
+    "recommendation": PRIORITY_HIGH,
+    "growth_analysis": PRIORITY_HIGH,
+    "enhancement": PRIORITY_LOW,
+    "custom_challenge": PRIORITY_LOW,
+}
+
+
+class RateLimitedError(Exception):
+    """レート制限により呼び出しを間引いた"""
+
+
+class TokenBucket:
+    """一定レートで補充されるトークンバケット"""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def available(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return self.tokens
+
+    def can_take(self, amount: float, keep: float = 0.0) -> bool:
+        return self.available() - amount >= keep
+
+    def take(self, amount: float) -> None:
+        self.tokens -= amount
+
+
+class TokenBudget:
+    """直近60秒間に使ったトークン数の上限"""
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, tokens_per_minute: float):
+        self.limit = tokens_per_minute
+        self._entries = deque()  # (時刻, トークン数)
+        self._used = 0.0
+
+    def used(self) -> float:
+        cutoff = time.monotonic() - self.WINDOW_SECONDS
+        while self._entries and self._entries[0][0] < cutoff:
+            self._used -= self._entries.popleft()[1]
+        return self._used
+
+    def can_consume(self, tokens: float, keep: float = 0.0) -> bool:
+        return self.used() + tokens <= self.limit - keep
+
+    def consume(self, tokens: float) -> None:
+        self._entries.append((time.monotonic(), tokens))
+        self._used += tokens
+
+
+class LLMRateLimiter:
+    """優先度付きのLLM呼び出しレート制限
+
+    低優先度の呼び出しは、リクエスト数・トークン予算のそれぞれ reserve の割合を
+    高優先度の呼び出しのために残した範囲でのみ許可する。許可できない呼び出しは
+    待たずに RateLimitedError で間引き、種別ごとに回数を記録する。
+    """
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+                 low_priority_reserve: float = DEFAULT_LOW_PRIORITY_RESERVE,
+                 chars_per_token: float = DEFAULT_CHARS_PER_TOKEN,
+                 expected_output_tokens: int = DEFAULT_EXPECTED_OUTPUT_TOKENS):
+        burst = max(1.0, requests_per_minute / 4)
+        self.requests = TokenBucket(requests_per_minute / 60.0, burst) if requests_per_minute > 0 else None
+        self.budget = TokenBudget(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.low_priority_reserve = low_priority_reserve
+        self.chars_per_token = chars_per_token
+        self.expected_output_tokens = expected_output_tokens
+        self._lock = threading.Lock()
+        self.admitted = defaultdict(int)
+        self.shed = defaultdict(int)
+        self.tokens_used = 0
+
+    def estimate_tokens(self, text: str) -> int:
+        """文字数からトークン数を概算"""
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def acquire(self, kind: str, prompt: str) -> int:
+        """呼び出しを許可して見積もりトークン数を返す（許可できなければ RateLimitedError）"""
+        estimated = self.estimate_tokens(prompt) + self.expected_output_tokens
+        low_priority = CALL_PRIORITIES.get(kind, PRIORITY_HIGH) == PRIORITY_LOW
+        with self._lock:
+            request_keep = self.requests.capacity * self.low_priority_reserve if self.requests and low_priority else 0.0
+            budget_keep = self.budget.limit * self.low_priority_reserve if self.budget and low_priority else 0.0
+            allowed = (
+                (self.requests is None or self.requests.can_take(1, request_keep)) and
+                (self.budget is None or self.budget.can_consume(estimated, budget_keep))
+            )
+            if not allowed:
+                self.shed[kind] += 1
+                raise RateLimitedError(f"AI call shed by rate limiter: {kind}")
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.budget is not None:
+                self.budget.consume(estimated)
+            self.admitted[kind] += 1
+            self.tokens_used += estimated
+        return estimated
+
+    def settle(self, estimated: int, prompt: str, output: str) -> None:
+        """実際の出力の長さで見積もりとの差分を予算に反映"""
+        actual = self.estimate_tokens(prompt) + self.estimate_tokens(output)
+        with self._lock:
+            if self.budget is not None:
+                self.budget.consume(actual - estimated)
+            self.tokens_used += actual - estimated
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "admitted": dict(self.admitted),
+                "shed": dict(self.shed),
+                "tokens_used": self.tokens_used,
+                "requests_available": round(self.requests.available(), 2) if self.requests else None,
+                "tokens_used_last_minute": round(self.budget.used()) if self.budget else None
+            }
@@ -0,0 +1,179 @@
+# 事前生成したAIレコメンドのプール（バックグラウンドで補充）
+import logging
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# プール設定（環境変数で変更可能）
+DEFAULT_POOL_ENABLED = os.getenv("RECOMMENDATION_POOL_ENABLED", "false").lower() == "true"  # 個人化より応答速度を優先する場合に有効化
+DEFAULT_POOL_SIZE = int(os.getenv("RECOMMENDATION_POOL_SIZE", "3"))                           # バケットあたりの在庫数
+DEFAULT_POOL_TTL = float(os.getenv("RECOMMENDATION_POOL_TTL", "1800"))                         # 在庫の有効期限（秒）
+DEFAULT_REFILL_INTERVAL = float(os.getenv("RECOMMENDATION_POOL_REFILL_INTERVAL", "1.0"))       # Gemini呼び出しの最小間隔（秒）
+DEFAULT_MAX_BUCKETS = int(os.getenv("RECOMMENDATION_POOL_MAX_BUCKETS", "256"))
+
+BucketKey = Tuple[int, str, Tuple[str, ...]]
+
+
+class PoolBucket:
+    """レベル・最も多いカテゴリー・回避カテゴリーが同じリクエスト向けの在庫
+
+    在庫はキーの値だけから作り、個々のユーザーの履歴・興味は含まない。
+    """
+
+    def __init__(self, favorite_category: str, avoid_categories: Tuple[str, ...]):
+        self.entries: Deque[Tuple[float, str, Dict]] = deque()
+        self.preferences = {'avoidCategories': list(avoid_categories)}
+        # 最も多いカテゴリーだけを持つ履歴として生成に使う
+        self.experiences = [{'category': favorite_category}] if favorite_category else []
+
+
+class RecommendationPool:
+    """suggest_custom_challenge / enhance_challenge_with_ai の結果をバケット別に事前生成して保持
+
+    在庫があればGeminiを待たずにそれを返す代わりに、個々のユーザーの履歴ではなく
+    バケット単位の傾向に合わせた提案になる（既定では無効、RECOMMENDATION_POOL_ENABLED=true で有効）。
+    take() は在庫から O(1) で取り出して補充を予約する。補充はイベントループ上の
+    1つのワーカーが RECOMMENDATION_POOL_REFILL_INTERVAL 間隔で順に行うため、
+    Geminiへのトラフィックは一定レートのバックグラウンドの流れになる。
+    """
+
+    def __init__(self, ai_service, engine, pool_size: int = DEFAULT_POOL_SIZE, ttl: float = DEFAULT_POOL_TTL,
+                 refill_interval: float = DEFAULT_REFILL_INTERVAL, max_buckets: int = DEFAULT_MAX_BUCKETS,
+                 enabled: bool = DEFAULT_POOL_ENABLED, custom_challenge_rate: float = 0.3):
+        self.ai_service = ai_service
+        self.engine = engine
+        self.pool_size = max(1, pool_size)
+        self.ttl = ttl
+        self.refill_interval = refill_interval
+        self.max_buckets = max_buckets
+        self.enabled = enabled
+        self.custom_challenge_rate = custom_challenge_rate
+        self._buckets: "OrderedDict[BucketKey, PoolBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued = set()
+        self._worker: Optional[asyncio.Task] = None
+        self._loop = None
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.refill_failures = 0
+
+    @staticmethod
+    def bucket_key(level: int, preferences: Dict, user_analysis: Dict) -> BucketKey:
+        """レベル・最も多いカテゴリー・回避カテゴリーの組をバケットのキーにする"""
+        favorites = user_analysis.get('favorite_categories') or []
+        avoid = tuple(sorted(preferences.get('avoidCategories', []) or []))
+        return level, favorites[0] if favorites else "", avoid
+
+    def take(self, level: int, preferences: Dict, user_analysis: Dict) -> Optional[Tuple[str, Dict]]:
+        """在庫から (種別, 結果) を1件取り出し（なければNone）、補充を予約する"""
+        if not self.enabled or not self.ai_service.enabled:
+            return None
+
+        key = self.bucket_key(level, preferences, user_analysis)
+        now = time.monotonic()
+        entry = None
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = PoolBucket(key[1], key[2])
+                self._buckets[key] = bucket
+                while len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            while bucket.entries:
+                created_at, kind, data = bucket.entries.popleft()
+                if now - created_at <= self.ttl:
+                    entry = (kind, data)
+                    break
+            if entry is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        self._schedule_refill(key)
+        return entry
+
+    def _schedule_refill(self, key: BucketKey) -> None:
+        """補充キューにバケットを追加（同じバケットは重複させない）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._queued = set()
+            self._worker = loop.create_task(self._run_worker())
+
+        if key not in self._queued:
+            self._queued.add(key)
+            self._queue.put_nowait(key)
+
+    async def _run_worker(self) -> None:
+        """在庫が目標数に達するまで、一定間隔でバケットを補充し続ける"""
+        queue = self._queue
+        while True:
+            key = await queue.get()
+            self._queued.discard(key)
+            with self._lock:
+                bucket = self._buckets.get(key)
+                needed = bucket is not None and len(bucket.entries) < self.pool_size
+            if not needed:
+                continue
+
+            try:
+                entry = await self._generate(key[0], bucket)
+                if entry is not None:
+                    with self._lock:
+                        bucket.entries.append((time.monotonic(), *entry))
+                        needed = len(bucket.entries) < self.pool_size
+                    self.refills += 1
+                else:
+                    self.refill_failures += 1
+                    needed = False
+            except Exception as e:
+                self.refill_failures += 1
+                needed = False
+                logger.warning("⚠️ Recommendation pool refill failed: %s", e)
+
+            # 目標数に満たなければ再度キューに入れる（他のバケットと交互に補充、失敗時は次の取り出しまで待つ）
+            if needed and key not in self._queued:
+                self._queued.add(key)
+                queue.put_nowait(key)
+            await asyncio.sleep(self.refill_interval)
+
+    async def _generate(self, level: int, bucket: PoolBucket) -> Optional[Tuple[str, Dict]]:
+        """バケットのキーの値から在庫を1件生成（ライブの呼び出しと同じ割合でカスタムチャレンジ）"""
+        if bucket.experiences and random.random() < self.custom_challenge_rate:
+            custom = await self.ai_service.asuggest_custom_challenge(bucket.preferences, bucket.experiences, level)
+            if custom:
+                return "custom_challenge", custom
+
+        profile = self.engine.get_user_profile(bucket.experiences)
+        base = self.engine.get_personalized_recommendation(level, bucket.preferences, bucket.experiences, profile=profile)
+        enhanced = await self.ai_service.aenhance_challenge_with_ai(base, profile.analysis, bucket.experiences)
+        return ("enhancement", enhanced) if enhanced.get('ai_enhanced') else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stocked = sum(len(bucket.entries) for bucket in self._buckets.values())
+            buckets = len(self._buckets)
+        return {
+            "enabled": self.enabled,
+            "buckets": buckets,
+            "stocked": stocked,
+            "hits": self.hits,
+            "misses": self.misses,
+            "refills": self.refills,
+            "refill_failures": self.refill_failures
+        }
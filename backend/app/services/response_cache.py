@@ -0,0 +1,185 @@
+# LLM応答キャッシュ（プロンプト内容でアドレス指定）
+import logging
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from .sqlite_utils import connect_sqlite, reopen_after_fork
+
+logger = logging.getLogger(__name__)
+
+# キャッシュ設定（環境変数で変更可能）
+# 複数ワーカー（WEB_CONCURRENCY > 1）では既定でワーカー間共有のSQLiteを使う
+DEFAULT_CACHE_BACKEND = os.getenv(
+    "AI_CACHE_BACKEND", "sqlite" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "memory"
+)  # memory / sqlite / none
+DEFAULT_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", "3600"))
+DEFAULT_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "1024"))
+DEFAULT_CACHE_PATH = os.getenv("AI_CACHE_PATH", "ai_response_cache.sqlite3")
+
+
+class MemoryCacheBackend:
+    """プロセス内のLRUキャッシュ"""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """ローカルディスク上のSQLiteキャッシュ（複数ワーカーで共有可能）"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        # 生成時に接続できるか確かめる（失敗時は create_response_cache がメモリに切り替える）
+        self._db: Optional[sqlite3.Connection] = self._open()
+        reopen_after_fork(self)
+
+    def _open(self) -> sqlite3.Connection:
+        conn = connect_sqlite(self.path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS ai_response_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ai_response_cache_last_access"
+            " ON ai_response_cache (last_access)"
+        )
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """fork後の子プロセスでは初回使用時に開き直す（呼び出し側で _lock を保持する）"""
+        if self._db is None:
+            self._db = self._open()
+        return self._db
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM ai_response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM ai_response_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE ai_response_cache SET last_access = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ai_response_cache (key, value, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now)
+            )
+            # 上限を超えた分を最終アクセスの古い順に削除
+            self._conn.execute(
+                "DELETE FROM ai_response_cache WHERE key IN ("
+                " SELECT key FROM ai_response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM ai_response_cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM ai_response_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """プロンプトとモデル名のハッシュをキーにしたLLM応答キャッシュ"""
+
+    def __init__(self, backend=None, ttl: float = DEFAULT_CACHE_TTL):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(prompt: str, model_name: str) -> str:
+        """キャッシュキーを生成"""
+        return hashlib.sha256(f"{model_name}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str, model_name: str) -> Optional[str]:
+        value = self.backend.get(self.make_key(prompt, model_name))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, prompt: str, model_name: str, value: str) -> None:
+        if value:
+            self.backend.set(self.make_key(prompt, model_name), value, self.ttl)
+
+    def clear(self) -> None:
+        self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict:
+        """ヒット率などの統計情報"""
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "ttl": self.ttl
+        }
+
+
+def create_response_cache(backend: str = DEFAULT_CACHE_BACKEND) -> Optional[ResponseCache]:
+    """設定に応じたキャッシュを生成（noneの場合はNone）"""
+    backend = backend.lower()
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        try:
+            return ResponseCache(SQLiteCacheBackend())
+        except sqlite3.Error as e:
+            logger.warning("⚠️ SQLite cache unavailable, falling back to memory: %s", e)
+    return ResponseCache(MemoryCacheBackend())
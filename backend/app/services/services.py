@@ -1,10 +1,14 @@
 # backend/app/services.py
+import os
 import random
 import json
 import math
+import asyncio
+import logging
+import threading
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
-from collections import defaultdict, Counter
+from typing import Dict, List, Any, Optional, Awaitable, Tuple, AsyncIterator
+from collections import defaultdict
 
 # Option 1の場合
 try:
@@ -14,20 +18,43 @@ except ImportError:
     from app.ai_service import AIRecommendationService
 
 from app.data.challenges import CHALLENGES_DATA, CATEGORY_METADATA, LEVEL_METADATA
+from app.services.challenge_index import ChallengeIndex
+from app.services.user_profile import UserProfile, UserProfileCache
+from app.services.history_store import create_history_store
+from app.services.user_aggregates import UserAggregateRegistry
+from app.services.recommendation_pool import RecommendationPool
+from app.services.metrics import STAGE_SECONDS, RECOMMENDATION_RESULTS
+
+logger = logging.getLogger(__name__)
 
 # 強化されたアンチ最適化レコメンドエンジン
 class SerendipityEngine:
     def __init__(self):
-        """初期化時にデータを読み込み"""
+        """初期化時にデータを読み込み（索引は初回使用時または warm_up() で作る）"""
         self.challenges_db = CHALLENGES_DATA
         self.category_metadata = CATEGORY_METADATA
         self.level_metadata = LEVEL_METADATA
         
-        # 動的データ（ユーザー履歴等）
-        self.user_experiences = defaultdict(list)
-        self.user_feedback = defaultdict(list)
+        self._challenge_index: Optional[ChallengeIndex] = None
+        self._index_lock = threading.Lock()
         
-        print(f"✅ SerendipityEngine initialized with {sum(len(challenges) for challenges in self.challenges_db.values())} challenges")
+        # 体験履歴の分析結果をメモ化
+        self.profile_cache = UserProfileCache()
+    
+    @property
+    def challenge_index(self) -> ChallengeIndex:
+        """レベル別のスコア・カテゴリー配列（初回使用時に事前計算）"""
+        if self._challenge_index is None:
+            with self._index_lock:
+                if self._challenge_index is None:
+                    self._challenge_index = ChallengeIndex(self.challenges_db, self.category_metadata)
+                    logger.info("✅ SerendipityEngine initialized with %d challenges",
+                                sum(len(challenges) for challenges in self.challenges_db.values()))
+        return self._challenge_index
+    
+    def warm_up(self) -> None:
+        """索引を事前に作る（gunicorn ではfork前に呼ぶとワーカー間で共有される）"""
+        self.challenge_index
     
     def get_challenge_by_level(self, level: int) -> List[Dict]:
         """レベル別チャレンジを取得"""
@@ -50,67 +77,39 @@ class SerendipityEngine:
             "difficulty": "unknown"
         })
     
-    def get_personalized_recommendation(self, level: int, preferences: Dict, experiences: List[Dict] = None) -> Dict:
+    def get_personalized_recommendation(self, level: int, preferences: Dict, experiences: List[Dict] = None,
+                                        profile: Optional[UserProfile] = None) -> Dict:
         """パーソナライズされたレコメンデーション"""
-        available_challenges = self.get_challenge_by_level(level)
+        level_index = self.challenge_index.get_level(level)
         
-        if not available_challenges:
+        if not level_index:
             return self._create_fallback_challenge(level)
         
-        # ユーザー分析
-        user_analysis = self._analyze_user_preferences(experiences or [])
+        # ユーザー分析（呼び出し元で計算済みならそれを再利用）
+        if profile is None:
+            profile = self.get_user_profile(experiences or [])
+        user_analysis = profile.analysis
         
-        # アンチ最適化スコアの計算
-        scored_challenges = []
-        for challenge in available_challenges:
-            score = self._calculate_anti_optimization_score(challenge, user_analysis, preferences)
-            scored_challenges.append((challenge, score))
+        # アンチ最適化スコアの計算（レベル内の全チャレンジを一括計算）
+        scores = self.challenge_index.score(level_index, user_analysis, preferences)
         
         # ランダム性を保ちつつ、スコアの高いものを優先
-        challenge = self._weighted_random_selection(scored_challenges)
+        selected_index = self.challenge_index.weighted_random_index(scores)
+        challenge = level_index.challenges[selected_index]
         
-        # チャレンジを強化
-        enhanced_challenge = self._enhance_challenge(challenge, user_analysis)
+        # チャレンジを強化（選択時のスコアをそのまま使う）
+        enhanced_challenge = self._enhance_challenge(challenge, user_analysis, float(scores[selected_index]))
         
         return enhanced_challenge
     
+    def get_user_profile(self, experiences: List[Dict]) -> UserProfile:
+        """体験履歴の分析結果を取得（同じ履歴ならメモ化された結果を返す）"""
+        with STAGE_SECONDS.time(stage="analyze_user_preferences"):
+            return self.profile_cache.get_or_create(experiences, self.category_metadata.keys())
+    
     def _analyze_user_preferences(self, experiences: List[Dict]) -> Dict:
         """ユーザーの体験履歴を分析"""
-        if not experiences:
-            return {
-                "total_experiences": 0,
-                "favorite_categories": [],
-                "avoided_categories": [],
-                "diversity_score": 0.5,
-                "recent_trend": "balanced"
-            }
-        
-        # カテゴリー分析
-        category_counts = Counter(exp.get('category', 'その他') for exp in experiences)
-        
-        # 多様性スコア計算
-        total_categories = len(self.category_metadata)
-        experienced_categories = len(category_counts)
-        diversity_score = min(experienced_categories / total_categories, 1.0)
-        
-        # 最近のトレンド分析
-        recent_experiences = experiences[-5:] if len(experiences) >= 5 else experiences
-        recent_categories = [exp.get('category', '') for exp in recent_experiences]
-        
-        return {
-            "total_experiences": len(experiences),
-            "favorite_categories": [cat for cat, count in category_counts.most_common(3)],
-            "avoided_categories": self._find_avoided_categories(category_counts),
-            "diversity_score": diversity_score,
-            "recent_categories": recent_categories,
-            "category_distribution": dict(category_counts)
-        }
-    
-    def _find_avoided_categories(self, category_counts: Counter) -> List[str]:
-        """避けられがちなカテゴリーを特定"""
-        all_categories = set(self.category_metadata.keys())
-        experienced_categories = set(category_counts.keys())
-        return list(all_categories - experienced_categories)
+        return self.get_user_profile(experiences).analysis
     
     def _calculate_anti_optimization_score(self, challenge: Dict, user_analysis: Dict, preferences: Dict) -> float:
         """アンチ最適化スコアを計算"""
@@ -139,29 +138,7 @@ class SerendipityEngine:
         
         return max(0.0, min(1.0, score))
     
-    def _weighted_random_selection(self, scored_challenges: List[tuple]) -> Dict:
-        """重み付きランダム選択"""
-        if not scored_challenges:
-            return self._create_fallback_challenge(1)
-        
-        # スコアに基づく重み計算
-        total_weight = sum(score for _, score in scored_challenges)
-        if total_weight == 0:
-            return random.choice([challenge for challenge, _ in scored_challenges])
-        
-        # 重み付きランダム選択
-        rand = random.uniform(0, total_weight)
-        cumulative = 0
-        
-        for challenge, score in scored_challenges:
-            cumulative += score
-            if rand <= cumulative:
-                return challenge
-        
-        # フォールバック
-        return scored_challenges[0][0]
-    
-    def _enhance_challenge(self, challenge: Dict, user_analysis: Dict) -> Dict:
+    def _enhance_challenge(self, challenge: Dict, user_analysis: Dict, score: Optional[float] = None) -> Dict:
         """チャレンジを強化"""
         enhanced = challenge.copy()
         
@@ -183,10 +160,10 @@ class SerendipityEngine:
         })
         
         # パーソナライゼーション情報
+        if score is None:
+            score = self._calculate_anti_optimization_score(challenge, user_analysis, {})
         enhanced.update({
-            "anti_optimization_score": self._calculate_anti_optimization_score(
-                challenge, user_analysis, {}
-            ),
+            "anti_optimization_score": score,
             "personalization_reason": self._generate_personalization_reason(
                 challenge, user_analysis
             ),
@@ -253,96 +230,270 @@ class UserLearningEngine:
 serendipity_engine = SerendipityEngine()
 learning_engine = UserLearningEngine()
 ai_service = AIRecommendationService()
+history_store = create_history_store()
+aggregate_registry = UserAggregateRegistry(history_store)
 
-# サービス関数
-def get_recommendation_service(level: int, preferences: Dict, experiences: List[Dict] = None) -> Dict:
-    """AI強化されたレコメンドサービス"""
+# サーバー側履歴からプロンプト用に読み込む最新の体験数
+RECENT_HISTORY_LIMIT = 10
+
+# レコメンド全体でAI呼び出しを待つ上限時間（秒）
+RECOMMENDATION_LATENCY_BUDGET = float(os.getenv("RECOMMENDATION_LATENCY_BUDGET", "10"))
+
+# カスタムチャレンジを採用する確率
+CUSTOM_CHALLENGE_RATE = 0.3
+
+# 事前生成したAIレコメンドのプール
+recommendation_pool = RecommendationPool(ai_service, serendipity_engine, custom_challenge_rate=CUSTOM_CHALLENGE_RATE)
+
+async def _improving_results(candidates: List[Tuple[str, Awaitable]], budget: float) -> AsyncIterator[Tuple[str, Dict]]:
+    """優先度順の候補を同時に実行し、それまでより優先度の高い有効な結果が得られるたびに返す
+
+    より優先度の高い候補が全て完了（または予算切れ）した時点で終了する。
+    """
+    if not candidates:
+        return
+    
+    order = [name for name, _ in candidates]
+    tasks = {asyncio.ensure_future(coro): name for name, coro in candidates}
+    results = {}
+    pending = set(tasks)
+    best_rank = len(order)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget
+    
     try:
-        print(f"🔄 Recommendation service called - Level: {level}, Experiences: {len(experiences or [])}")
-        
-        # ユーザー分析
-        user_analysis = serendipity_engine._analyze_user_preferences(experiences or [])
-        
-        # まずAIレコメンデーションを試行
-        ai_recommendation = None
-        if ai_service.enabled and len(experiences or []) >= 2:  # 最小限の履歴がある場合
-            try:
-                ai_recommendation = ai_service.generate_ai_recommendation(
-                    preferences, experiences or [], level
-                )
-                
-                if ai_recommendation:
-                    print(f"✅ AI recommendation generated: {ai_recommendation.get('title', 'Unknown')}")
-                    return {
-                        "status": "success",
-                        "data": ai_recommendation,
-                        "source": "ai_recommendation",
-                        "ai_enhanced": True,
-                        "engine_version": "2.1-AI"
-                    }
-            except Exception as ai_error:
-                print(f"⚠️ AI recommendation failed: {str(ai_error)}")
-        
-        # AI失敗またはAI無効の場合は従来のレコメンデーション
-        recommendation = serendipity_engine.get_personalized_recommendation(level, preferences, experiences)
-        print(f"📋 Base recommendation: {recommendation.get('title', 'Unknown')}")
-        
-        # AI強化を試行（従来チャレンジの強化）
-        enhanced_recommendation = recommendation
-        if ai_service.enabled:
-            try:
-                enhanced_recommendation = ai_service.enhance_challenge_with_ai(
-                    recommendation, user_analysis, experiences or []
-                )
-            except Exception as e:
-                print(f"⚠️ AI enhancement failed: {str(e)}")
-        
-        # AI生成のカスタムチャレンジも試行
-        if ai_service.enabled and len(experiences or []) > 5:  # 十分な履歴がある場合のみ
-            try:
-                custom_challenge = ai_service.suggest_custom_challenge(preferences, experiences, level)
-                if custom_challenge and random.random() < 0.3:  # 30%の確率でカスタムチャレンジ
-                    enhanced_recommendation = custom_challenge
-                    print("🤖 Using AI-generated custom challenge")
-            except Exception as e:
-                print(f"⚠️ AI custom challenge failed: {str(e)}")
-        
-        print(f"✅ Enhanced recommendation generated: {enhanced_recommendation.get('title', 'Unknown')}")
-        
+        while pending:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = tasks[task]
+                if task.cancelled() or task.exception() is not None:
+                    if not task.cancelled():
+                        logger.warning("⚠️ AI %s failed: %s", name, task.exception())
+                    results[name] = None
+                else:
+                    results[name] = task.result()
+            
+            # 完了済みの中で最も優先度の高い有効な結果が更新されていれば返す
+            for rank, name in enumerate(order[:best_rank]):
+                if results.get(name):
+                    best_rank = rank
+                    yield name, results[name]
+                    break
+            
+            # より優先度の高い候補が未完了でなければ、その時点で確定
+            if all(name in results for name in order[:best_rank]):
+                return
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def _first_usable_result(candidates: List[Tuple[str, Awaitable]], budget: float) -> Optional[Tuple[str, Dict]]:
+    """優先度順の候補を同時に実行し、予算内で最も優先度の高い有効な結果を返す"""
+    selected = None
+    async for selected in _improving_results(candidates, budget):
+        pass
+    return selected
+
+async def _ai_enhancement_or_none(recommendation: Dict, user_analysis: Dict, experiences: List[Dict]) -> Optional[Dict]:
+    """AI強化に失敗した場合はNoneを返す"""
+    enhanced = await ai_service.aenhance_challenge_with_ai(recommendation, user_analysis, experiences)
+    return enhanced if enhanced.get('ai_enhanced') else None
+
+def _prepare_recommendation(level: int, preferences: Dict, experiences: List[Dict], profile: Optional[UserProfile],
+                            live_on_pool_hit: bool = False) -> Tuple[Dict, List[Tuple[str, Awaitable]], Optional[Tuple[str, Dict]]]:
+    """ルールベースのレコメンドと、優先度順に並べたAI呼び出しの候補を用意
+
+    プールに事前生成済みの結果があればそれを3つ目の値として返し、live_on_pool_hit が
+    False ならAI呼び出しの候補は作らない（Geminiを待たずに応答する）。
+    """
+    # ユーザー分析（このリクエスト内ではこの結果を使い回す）
+    if profile is None:
+        profile = serendipity_engine.get_user_profile(experiences)
+    user_analysis = profile.analysis
+    total_experiences = profile.total_experiences
+    logger.debug("🔄 Recommendation service called - Level: %s, Experiences: %d", level, total_experiences)
+    
+    # 従来のレコメンデーション（AI失敗時のフォールバックと強化の元データ）
+    with STAGE_SECONDS.time(stage="base_recommendation"):
+        recommendation = serendipity_engine.get_personalized_recommendation(level, preferences, experiences, profile=profile)
+    logger.debug("📋 Base recommendation: %s", recommendation.get('title', 'Unknown'))
+    
+    # 事前生成済みの結果（取り出した分はバックグラウンドで補充）
+    pooled = recommendation_pool.take(level, preferences, user_analysis)
+    if pooled is not None:
+        logger.debug("📦 Using pooled %s: %s", pooled[0], pooled[1].get('title', 'Unknown'))
+        pooled = ("pooled_" + pooled[0], pooled[1])
+        if not live_on_pool_hit:
+            return recommendation, [], pooled
+    
+    # 独立したAI呼び出しを優先度順に並べる
+    candidates = []
+    if ai_service.available:
+        if total_experiences >= 2:  # 最小限の履歴がある場合
+            candidates.append(("recommendation", ai_service.agenerate_ai_recommendation(preferences, experiences, level)))
+        # 十分な履歴があり、30%の確率に当選した場合のみカスタムチャレンジを生成
+        if total_experiences > 5 and random.random() < CUSTOM_CHALLENGE_RATE:
+            candidates.append(("custom_challenge", ai_service.asuggest_custom_challenge(preferences, experiences, level)))
+        candidates.append(("enhancement", _ai_enhancement_or_none(recommendation, user_analysis, experiences)))
+    return recommendation, candidates, pooled
+
+def _recommendation_result(recommendation: Dict, selected: Optional[Tuple[str, Dict]]) -> Dict:
+    """採用された候補からレスポンスを組み立てる"""
+    RECOMMENDATION_RESULTS.inc(source=selected[0] if selected else "rule_based")
+    if selected and selected[0] == "recommendation":
+        ai_recommendation = selected[1]
+        logger.debug("✅ AI recommendation generated: %s", ai_recommendation.get('title', 'Unknown'))
+        return {
+            "status": "success",
+            "data": ai_recommendation,
+            "source": "ai_recommendation",
+            "ai_enhanced": True,
+            "engine_version": "2.1-AI"
+        }
+    
+    if selected and selected[0].startswith("pooled_"):
+        logger.debug("✅ Pooled recommendation served: %s", selected[1].get('title', 'Unknown'))
         return {
             "status": "success",
-            "data": enhanced_recommendation,
-            "source": "enhanced_serendipity",
-            "personalization_applied": True,
-            "ai_enhanced": enhanced_recommendation.get('ai_enhanced', False),
+            "data": selected[1],
+            "source": "pooled",
+            "personalization_applied": False,
+            "ai_enhanced": selected[1].get('ai_enhanced', True),
             "engine_version": "2.1-AI"
         }
     
+    enhanced_recommendation = recommendation
+    if selected:
+        enhanced_recommendation = selected[1]
+        if selected[0] == "custom_challenge":
+            logger.debug("🤖 Using AI-generated custom challenge")
+    
+    logger.debug("✅ Enhanced recommendation generated: %s", enhanced_recommendation.get('title', 'Unknown'))
+    
+    return {
+        "status": "success",
+        "data": enhanced_recommendation,
+        "source": "enhanced_serendipity",
+        "personalization_applied": True,
+        "ai_enhanced": enhanced_recommendation.get('ai_enhanced', False),
+        "engine_version": "2.1-AI"
+    }
+
+def _fallback_result(level: int, error: Exception) -> Dict:
+    """エラー時のフォールバックレスポンス"""
+    RECOMMENDATION_RESULTS.inc(source="fallback")
+    try:
+        fallback_challenge = serendipity_engine._create_fallback_challenge(level)
+        return {
+            "status": "fallback",
+            "data": fallback_challenge,
+            "source": "fallback",
+            "error": str(error),
+            "engine_version": "2.1-Fallback"
+        }
+    except Exception as fallback_error:
+        logger.error("❌ Fallback also failed: %s", fallback_error)
+        return {
+            "status": "error",
+            "data": {},
+            "error": f"Service error: {str(error)}, Fallback error: {str(fallback_error)}"
+        }
+
+# サービス関数
+async def get_recommendation_service(level: int, preferences: Dict, experiences: List[Dict] = None,
+                                     profile: Optional[UserProfile] = None) -> Dict:
+    """AI強化されたレコメンドサービス"""
+    try:
+        recommendation, candidates, pooled = _prepare_recommendation(level, preferences, experiences or [], profile)
+        with STAGE_SECONDS.time(stage="ai_fanout"):
+            selected = pooled or await _first_usable_result(candidates, RECOMMENDATION_LATENCY_BUDGET)
+        return _recommendation_result(recommendation, selected)
+    
     except Exception as e:
-        print(f"❌ Recommendation service error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Recommendation service error: %s", e)
         
         # フォールバック処理
-        try:
-            fallback_challenge = serendipity_engine._create_fallback_challenge(level)
-            return {
-                "status": "fallback",
-                "data": fallback_challenge,
-                "source": "fallback",
-                "error": str(e),
-                "engine_version": "2.1-Fallback"
-            }
-        except Exception as fallback_error:
-            print(f"❌ Fallback also failed: {str(fallback_error)}")
-            return {
-                "status": "error",
-                "data": {},
-                "error": f"Service error: {str(e)}, Fallback error: {str(fallback_error)}"
-            }
+        return _fallback_result(level, e)
+
+async def stream_recommendation_service(level: int, preferences: Dict, experiences: List[Dict] = None,
+                                        profile: Optional[UserProfile] = None) -> AsyncIterator[Dict]:
+    """レコメンドを段階的に返すストリーミング版
+
+    ルールベースの結果を "base" として即座に返し、AI呼び出しの結果がそれまでより
+    優先度の高いものであれば "update" として順次返す。最後に通常版と同じ形式の
+    レスポンスを "done" として返す。
+    """
+    try:
+        recommendation, candidates, pooled = _prepare_recommendation(level, preferences, experiences or [], profile,
+                                                                     live_on_pool_hit=True)
+    except Exception as e:
+        logger.exception("❌ Recommendation stream error: %s", e)
+        yield {"event": "done", "data": _fallback_result(level, e)}
+        return
+    
+    yield {"event": "base", "data": recommendation}
+    
+    # 事前生成済みの結果を先に返し、個人向けのAI呼び出しの結果が届けばそれに置き換える
+    selected = pooled
+    if pooled:
+        yield {"event": "update", "source": pooled[0], "data": pooled[1]}
+    try:
+        async for selected in _improving_results(candidates, RECOMMENDATION_LATENCY_BUDGET):
+            yield {"event": "update", "source": selected[0], "data": selected[1]}
+    except Exception as e:
+        logger.warning("⚠️ Recommendation stream update failed: %s", e)
+    
+    yield {"event": "done", "data": _recommendation_result(recommendation, selected)}
+
+def resolve_user_experiences(user_id: Optional[str], experiences: Optional[List[Dict]]) -> List[Dict]:
+    """リクエストの体験履歴を解決
+
+    user_id がある場合は未同期分をストアに追記し、サーバー側の全履歴を返す。
+    ない場合は従来通りリクエストの体験履歴をそのまま使う。
+    """
+    if not user_id:
+        return experiences or []
+    
+    if experiences:
+        aggregate_registry.append(user_id, experiences)
+    history, _ = history_store.get_experiences(user_id)
+    return history
+
+def resolve_user_context(user_id: Optional[str], experiences: Optional[List[Dict]]) -> Tuple[List[Dict], UserProfile]:
+    """リクエストの体験履歴と分析結果を解決
+
+    user_id がある場合は増分集計からプロファイルを作り、最新の体験だけを読み込む。
+    履歴の長さに関係なく一定時間で済む。
+    """
+    if not user_id:
+        experiences = experiences or []
+        return experiences, serendipity_engine.get_user_profile(experiences)
+    
+    if experiences:
+        aggregate_registry.append(user_id, experiences)
+    aggregates = aggregate_registry.get(user_id)
+    profile = aggregates.to_profile(serendipity_engine.category_metadata.keys())
+    return history_store.get_recent_experiences(user_id, RECENT_HISTORY_LIMIT), profile
+
+def append_history_service(user_id: str, experiences: List[Dict]) -> Dict:
+    """体験履歴の追記サービス"""
+    cursor = aggregate_registry.append(user_id, experiences)
+    return {"user_id": user_id, "cursor": cursor, "experiences": []}
+
+def get_history_service(user_id: str, cursor: int = 0, limit: Optional[int] = None) -> Dict:
+    """カーソル以降の体験履歴を取得するサービス"""
+    experiences, new_cursor = history_store.get_experiences(user_id, after=cursor, limit=limit)
+    return {"user_id": user_id, "cursor": new_cursor, "experiences": experiences}
 
-def process_feedback_service(challenge_id: str, feedback_type: str, rating: int = None) -> Dict:
+def process_feedback_service(challenge_id: str, feedback_type: str, rating: int = None, user_id: Optional[str] = None) -> Dict:
     """フィードバック処理サービス"""
+    if user_id:
+        result = learning_engine.process_feedback(challenge_id, feedback_type, user_id)
+        history_store.append_feedback(user_id, learning_engine.feedback_history[user_id][-1])
+        return result
     return learning_engine.process_feedback(challenge_id, feedback_type)
 
 def update_preferences_service(preferences: Dict) -> Dict:
@@ -353,21 +504,23 @@ def update_preferences_service(preferences: Dict) -> Dict:
         "updated_preferences": preferences
     }
 
-def analyze_growth_trends(experiences: List[Dict]) -> Dict:
+async def analyze_growth_trends(experiences: List[Dict], profile: Optional[UserProfile] = None) -> Dict:
     """成長トレンド分析（AI強化版）"""
-    if not experiences:
+    if profile is None:
+        profile = serendipity_engine.get_user_profile(experiences)
+    if not profile.total_experiences:
         return {"status": "no_data", "message": "分析するデータがありません"}
     
-    user_analysis = serendipity_engine._analyze_user_preferences(experiences)
+    user_analysis = profile.analysis
     
     # AIで詳細な成長分析を試行
     ai_analysis = None
-    if ai_service.enabled and len(experiences) >= 3:
+    if ai_service.available and profile.total_experiences >= 3:
         try:
-            ai_analysis = ai_service.analyze_growth_pattern(experiences)
-            print(f"✅ AI growth analysis completed")
+            ai_analysis = await ai_service.aanalyze_growth_pattern(experiences, user_analysis)
+            logger.debug("✅ AI growth analysis completed")
         except Exception as e:
-            print(f"⚠️ AI growth analysis failed: {str(e)}")
+            logger.warning("⚠️ AI growth analysis failed: %s", e)
     
     # 基本分析結果
     base_analysis = {
@@ -0,0 +1,55 @@
+# 同一キーの同時呼び出しを1回にまとめる（single-flight）
+import asyncio
+import weakref
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """実行中の呼び出しと同じキーの呼び出しは、新たに実行せずその結果を共有する
+
+    実際の処理は呼び出し元とは独立したタスクで実行するため、待っていた呼び出し元の
+    一部がキャンセルされても、他の呼び出し元には結果が届く。
+    """
+
+    def __init__(self):
+        # タスクはイベントループに紐づくため、ループごとに管理する
+        self._calls = weakref.WeakKeyDictionary()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _loop_calls(self) -> Dict[str, asyncio.Task]:
+        loop = asyncio.get_running_loop()
+        calls = self._calls.get(loop)
+        if calls is None:
+            calls = {}
+            self._calls[loop] = calls
+        return calls
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        calls = self._loop_calls()
+        task = calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(factory())
+            calls[key] = task
+
+            def finished(done: asyncio.Task) -> None:
+                if calls.get(key) is done:
+                    del calls[key]
+                # 待っている呼び出し元がいなくても例外が未処理扱いにならないようにする
+                if not done.cancelled():
+                    done.exception()
+
+            task.add_done_callback(finished)
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": sum(len(calls) for calls in list(self._calls.values()))
+        }
@@ -0,0 +1,30 @@
+# 複数ワーカーで共有するローカルSQLiteの接続処理
+import os
+import sqlite3
+import threading
+import weakref
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """WALモードで接続（複数プロセスからの同時読み込みと1つの書き込みを許可）"""
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def reopen_after_fork(store) -> None:
+    """fork後の子プロセスでは親から引き継いだ接続（store._db）を捨て、次の使用時に開き直す
+
+    gunicorn の preload_app のようにワーカー起動前に生成されたストアでも、
+    各ワーカーが自分の接続を持つようにする。
+    """
+    ref = weakref.ref(store)
+
+    def reopen() -> None:
+        target = ref()
+        if target is not None:
+            target._lock = threading.Lock()
+            target._db = None
+
+    os.register_at_fork(after_in_child=reopen)
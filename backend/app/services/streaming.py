@@ -0,0 +1,40 @@
+# ストリーミングレスポンス（Server-Sent Events / NDJSON）のエンコーダー
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+
+STREAM_SSE = "sse"
+STREAM_NDJSON = "ndjson"
+
+STREAM_MEDIA_TYPES = {
+    STREAM_SSE: "text/event-stream",
+    STREAM_NDJSON: "application/x-ndjson",
+}
+
+# プロキシによるバッファリングを無効化するヘッダー
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def select_stream_format(accept: Optional[str], requested: Optional[str] = None) -> str:
+    """クエリパラメータまたはAcceptヘッダーからストリーム形式を決定（既定はNDJSON）"""
+    if requested:
+        return STREAM_SSE if requested.lower() in ("sse", "event-stream") else STREAM_NDJSON
+    if "text/event-stream" in (accept or "").lower():
+        return STREAM_SSE
+    return STREAM_NDJSON
+
+
+def encode_stream_event(event: Dict[str, Any], fmt: str) -> bytes:
+    """{"event": 名前, ...} 形式のイベントを1件分のバイト列に変換"""
+    payload = json.dumps(event, ensure_ascii=False, separators=(",", ":"), default=str)
+    if fmt == STREAM_SSE:
+        return f"event: {event.get('event', 'message')}\ndata: {payload}\n\n".encode("utf-8")
+    return f"{payload}\n".encode("utf-8")
+
+
+async def encode_stream(events: AsyncIterator[Dict[str, Any]], fmt: str) -> AsyncIterator[bytes]:
+    """イベントのストリームを指定形式のバイト列ストリームに変換"""
+    async for event in events:
+        yield encode_stream_event(event, fmt)
@@ -0,0 +1,94 @@
+# ユーザー別の増分集計（体験追加時にO(1)で更新）
+import threading
+from collections import deque
+from typing import Dict, List, Iterable, Optional
+
+from .user_profile import UserProfile
+
+# 最近の体験として保持する件数
+RECENT_WINDOW = 5
+
+
+class UserAggregates:
+    """カテゴリー別件数・最近のカテゴリー・多様性を保持する集計"""
+
+    def __init__(self, category_counts: Optional[Dict[str, int]] = None, recent_categories: Iterable[str] = ()):
+        self.category_counts = dict(category_counts or {})
+        self.total_experiences = sum(self.category_counts.values())
+        self.recent_categories = deque(recent_categories, maxlen=RECENT_WINDOW)
+        self._profile: Optional[UserProfile] = None
+
+    def add(self, experience: Dict) -> None:
+        """体験を1件追加"""
+        category = experience.get('category', 'その他')
+        if category is None:
+            category = 'その他'
+        self.category_counts[category] = self.category_counts.get(category, 0) + 1
+        self.total_experiences += 1
+        self.recent_categories.append(experience.get('category', ''))
+        self._profile = None
+
+    @property
+    def distinct_categories(self) -> int:
+        return len(self.category_counts)
+
+    def diversity_score(self, total_categories: int) -> float:
+        """経験済みカテゴリー数に基づく多様性スコア"""
+        if not total_categories:
+            return 0.0
+        return min(self.distinct_categories / total_categories, 1.0)
+
+    def to_profile(self, all_categories: Iterable[str]) -> UserProfile:
+        """集計からプロファイルを生成（次の追加まで再利用）"""
+        if self._profile is None:
+            self._profile = UserProfile(
+                self.total_experiences,
+                self.category_counts,
+                list(self.recent_categories),
+                all_categories
+            )
+        return self._profile
+
+
+class UserAggregateRegistry:
+    """履歴ストアと同期したユーザー別集計のレジストリ"""
+
+    def __init__(self, history_store):
+        self.history_store = history_store
+        self._entries: Dict[str, UserAggregates] = {}
+        self._lock = threading.Lock()
+
+    def _hydrate(self, user_id: str) -> UserAggregates:
+        """ストアの集計テーブルと最新の体験から再構築"""
+        recent = self.history_store.get_recent_experiences(user_id, RECENT_WINDOW)
+        return UserAggregates(
+            self.history_store.get_category_counts(user_id),
+            [exp.get('category', '') for exp in recent]
+        )
+
+    def get(self, user_id: str) -> UserAggregates:
+        """ユーザーの集計を取得（他プロセスで追記・更新されていれば再構築）"""
+        counts = self.history_store.get_category_counts(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.category_counts == counts:
+                return entry
+        entry = self._hydrate(user_id)
+        with self._lock:
+            self._entries[user_id] = entry
+        return entry
+
+    def append(self, user_id: str, experiences: List[Dict]) -> int:
+        """体験をストアに追記し、実際に追加された分だけ集計を更新
+
+        既存の体験が更新された場合はカテゴリーが変わりうるため、次回の取得時にストアから再構築する。
+        """
+        with self._lock:
+            cursor, inserted, updated = self.history_store.append_experiences(user_id, experiences)
+            entry = self._entries.get(user_id)
+            if entry is not None and updated:
+                del self._entries[user_id]
+            elif entry is not None:
+                for exp in inserted:
+                    entry.add(exp)
+        return cursor
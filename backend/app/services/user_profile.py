@@ -0,0 +1,99 @@
+# リクエスト単位のユーザー履歴分析（プロファイル）
+import json
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Iterable
+
+# メモ化するプロファイル数の上限
+PROFILE_CACHE_SIZE = 256
+
+
+class UserProfile:
+    """体験履歴（または増分集計）から得た分析結果"""
+
+    def __init__(self, total_experiences: int, category_distribution: Dict[str, int],
+                 recent_categories: List[str], all_categories: Iterable[str]):
+        all_categories = list(all_categories)
+
+        # カテゴリー分析
+        self.total_experiences = total_experiences
+        self.category_distribution = dict(category_distribution)
+
+        # 多様性スコア計算
+        self.diversity_score = min(len(self.category_distribution) / len(all_categories), 1.0) if all_categories else 0.0
+
+        # 最近のトレンド分析
+        self.recent_categories = list(recent_categories)
+
+        # 件数が同じ場合は先に現れたカテゴリーを優先（Counter.most_common と同じ安定ソート）
+        ranked = sorted(self.category_distribution.items(), key=lambda item: -item[1])
+        self.favorite_categories = [cat for cat, count in ranked[:3]]
+        self.avoided_categories = [cat for cat in all_categories if cat not in self.category_distribution]
+
+        self.analysis = self._build_analysis()
+
+    @classmethod
+    def from_experiences(cls, experiences: List[Dict], all_categories: Iterable[str]) -> "UserProfile":
+        """体験リストから生成"""
+        return cls(
+            len(experiences),
+            Counter(exp.get('category', 'その他') for exp in experiences),
+            [exp.get('category', '') for exp in experiences[-5:]],
+            all_categories
+        )
+
+    def _build_analysis(self) -> Dict:
+        """従来の user_analysis 形式の辞書を生成"""
+        if not self.total_experiences:
+            return {
+                "total_experiences": 0,
+                "favorite_categories": [],
+                "avoided_categories": [],
+                "diversity_score": 0.5,
+                "recent_trend": "balanced"
+            }
+
+        return {
+            "total_experiences": self.total_experiences,
+            "favorite_categories": self.favorite_categories,
+            "avoided_categories": self.avoided_categories,
+            "diversity_score": self.diversity_score,
+            "recent_categories": self.recent_categories,
+            "category_distribution": self.category_distribution
+        }
+
+
+class UserProfileCache:
+    """体験リストのハッシュをキーにプロファイルをメモ化するLRU"""
+
+    def __init__(self, max_entries: int = PROFILE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, UserProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(experiences: List[Dict]) -> str:
+        """分析結果を決めるカテゴリー列からキーを生成"""
+        categories = [exp.get('category') for exp in experiences]
+        payload = json.dumps(categories, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+    def get_or_create(self, experiences: List[Dict], all_categories: Iterable[str]) -> UserProfile:
+        key = self.make_key(experiences)
+        with self._lock:
+            profile = self._entries.get(key)
+            if profile is not None:
+                self._entries.move_to_end(key)
+                return profile
+
+        profile = UserProfile.from_experiences(experiences, all_categories)
+        with self._lock:
+            self._entries[key] = profile
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return profile
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,110 @@
+# ビジュアライゼーションデータのバイナリ/カラム形式エンコーダー
+import json
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# MessagePack（任意）
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+FORMAT_JSON = "json"
+FORMAT_MSGPACK = "msgpack"
+FORMAT_BINARY = "binary"
+
+MEDIA_TYPES = {
+    FORMAT_JSON: "application/json",
+    FORMAT_MSGPACK: "application/x-msgpack",
+    FORMAT_BINARY: "application/octet-stream",
+}
+
+# バイナリ形式: マジック(4) + バージョン(uint32) + ヘッダー長(uint32) + JSONヘッダー + 8バイト境界に揃えた配列
+BINARY_MAGIC = b"SPVZ"
+BINARY_VERSION = 1
+BINARY_ALIGNMENT = 8
+
+
+def select_visualization_format(accept: Optional[str], requested: Optional[str] = None) -> str:
+    """クエリパラメータまたはAcceptヘッダーから出力形式を決定（既定はJSON）"""
+    if requested:
+        requested = requested.lower()
+        if requested in ("msgpack", "messagepack"):
+            return FORMAT_MSGPACK
+        if requested in ("binary", "octet-stream", "raw"):
+            return FORMAT_BINARY
+        return FORMAT_JSON
+
+    accept = (accept or "").lower()
+    if "application/x-msgpack" in accept or "application/msgpack" in accept:
+        return FORMAT_MSGPACK
+    if "application/octet-stream" in accept:
+        return FORMAT_BINARY
+    return FORMAT_JSON
+
+
+def _little_endian(array: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+
+
+def _array_descriptor(array: np.ndarray) -> Dict[str, Any]:
+    return {"dtype": array.dtype.newbyteorder("<").str, "shape": list(array.shape)}
+
+
+def encode_msgpack(data: Dict[str, Any]) -> bytes:
+    """配列を {dtype, shape, data(bytes)} に変換してMessagePackでエンコード"""
+    if not MSGPACK_AVAILABLE:
+        raise RuntimeError("msgpack is not installed")
+
+    def convert(value):
+        if isinstance(value, np.ndarray):
+            descriptor = _array_descriptor(value)
+            descriptor["data"] = _little_endian(value).tobytes()
+            return descriptor
+        if isinstance(value, dict):
+            return {key: convert(item) for key, item in value.items()}
+        return value
+
+    return msgpack.packb(convert(data), use_bin_type=True)
+
+
+def encode_binary(data: Dict[str, Any]) -> bytes:
+    """JSONヘッダー + 生のリトルエンディアン配列でエンコード
+
+    ヘッダー内の配列は {dtype, shape, offset, length} で表し、
+    offset は配列領域の先頭からのバイト位置。配列領域は 12 + ヘッダー長 を
+    8バイト境界に切り上げた位置から始まる（各配列も8バイト境界に揃える）。
+    """
+    buffers = []
+    offset = 0
+
+    def convert(value):
+        nonlocal offset
+        if isinstance(value, np.ndarray):
+            raw = _little_endian(value).tobytes()
+            descriptor = _array_descriptor(value)
+            descriptor.update({"offset": offset, "length": len(raw)})
+            padding = -len(raw) % BINARY_ALIGNMENT
+            buffers.append(raw + b"\0" * padding)
+            offset += len(raw) + padding
+            return descriptor
+        if isinstance(value, dict):
+            return {key: convert(item) for key, item in value.items()}
+        return value
+
+    header = json.dumps(convert(data), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    prefix = BINARY_MAGIC + struct.pack("<II", BINARY_VERSION, len(header))
+    header_padding = -(len(prefix) + len(header)) % BINARY_ALIGNMENT
+    return prefix + header + b" " * header_padding + b"".join(buffers)
+
+
+def encode_columnar(data: Dict[str, Any], fmt: str) -> Tuple[bytes, str]:
+    """カラム形式のデータを指定形式でエンコードし、(本文, メディアタイプ) を返す"""
+    if fmt == FORMAT_MSGPACK:
+        return encode_msgpack(data), MEDIA_TYPES[FORMAT_MSGPACK]
+    if fmt == FORMAT_BINARY:
+        return encode_binary(data), MEDIA_TYPES[FORMAT_BINARY]
+    raise ValueError(f"Unsupported columnar format: {fmt}")
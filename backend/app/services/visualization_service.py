@@ -1,6 +1,115 @@
 # backend/app/services/visualization_service.py
+import os
 import math
-from typing import List, Dict, Any, Optional
+import json
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from .history_store import experience_id
+
+# id → 色のメモテーブルの上限
+COLOR_CACHE_SIZE = 65536
+
+# ?include= で選択できる出力セクション
+VISUALIZATION_SECTIONS = ('spiral', 'floating', 'curves', 'stats')
+
+# 1レスポンスあたりの球体＋曲線の上限（0で無制限）
+DEFAULT_MAX_PRIMITIVES = int(os.getenv("VISUALIZATION_MAX_PRIMITIVES", "2000"))
+
+# 増分モード: らせんの最小容量と保持するユーザー状態数の上限
+INCREMENTAL_MIN_CAPACITY = 32
+INCREMENTAL_STATE_SIZE = 1024
+
+
+def stable_hash(value: Any) -> int:
+    """プロセスやPYTHONHASHSEEDに依存しない63ビットのハッシュ値"""
+    digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') >> 1
+
+
+def stable_seed(value: Any) -> Any:
+    """数値IDはそのまま、文字列IDなどは安定ハッシュから数値シードに変換"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return stable_hash(value) % 1000000
+
+
+
+def parse_visualization_sections(include: Optional[str]) -> Tuple[str, ...]:
+    """?include=spiral,curves,stats を検証してセクションの組に変換（未指定は全セクション）"""
+    if not include:
+        return VISUALIZATION_SECTIONS
+    requested = {section.strip().lower() for section in include.split(',') if section.strip()}
+    unknown = requested - set(VISUALIZATION_SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown visualization sections: {', '.join(sorted(unknown))}")
+    return tuple(section for section in VISUALIZATION_SECTIONS if section in requested)
+
+
+
+def parse_bounds(bounds: Optional[str]) -> Optional[Tuple[float, ...]]:
+    """?bounds=minX,minY,minZ,maxX,maxY,maxZ を検証して6要素の組に変換"""
+    if not bounds:
+        return None
+    try:
+        values = tuple(float(value) for value in bounds.split(','))
+    except ValueError:
+        raise ValueError(f"Invalid bounds: {bounds}")
+    if len(values) != 6 or any(low > high for low, high in zip(values[:3], values[3:])):
+        raise ValueError(f"Invalid bounds: {bounds}")
+    return values
+
+
+def _bounds_mask(x: np.ndarray, y: np.ndarray, z: np.ndarray, bounds: Tuple[float, ...]) -> np.ndarray:
+    min_x, min_y, min_z, max_x, max_y, max_z = bounds
+    return (x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y) & (z >= min_z) & (z <= max_z)
+
+
+class IncrementalLayoutState:
+    """ユーザー別の増分レイアウト状態
+
+    らせんの長さを容量（2のべき乗）に固定して配置するため、体験を追加しても
+    既存の球体は動かない。容量を超えたときだけ全体を再配置する（償却O(1)）。
+    """
+
+    def __init__(self, capacity: int):
+        self.instance = uuid.uuid4().hex[:12]
+        self.version = 0
+        self.capacity = capacity
+        self.completed: List[Dict[str, Any]] = []
+        self.completed_index: Dict[Any, int] = {}
+        self.spiral: List[Dict[str, Any]] = []
+        self.curves: List[Dict[str, Any]] = []
+        self.missions: "OrderedDict[Any, Dict[str, Any]]" = OrderedDict()
+        self.floating: List[Dict[str, Any]] = []
+        self.categories: Dict[str, int] = {}
+        self.total_experiences = 0
+
+    @property
+    def token(self) -> str:
+        return f"{self.instance}:{self.version}"
+
+    @staticmethod
+    def required_capacity(count: int) -> int:
+        capacity = INCREMENTAL_MIN_CAPACITY
+        while capacity < count:
+            capacity *= 2
+        return capacity
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'total_experiences': self.total_experiences,
+            'completed_count': len(self.completed),
+            'incomplete_count': len(self.missions),
+            'categories': dict(self.categories)
+        }
+
 
 class VisualizationService:
     """体験ストリングスの3D座標計算をサーバーサイドで実行"""
@@ -20,6 +129,13 @@ class VisualizationService:
             "アウトドア": "#86EFAC",       # 自然・アウトドアのエイリアス
             "学び": "#93C5FD",             # 学習・読書のエイリアス
         }
+        
+        # id → 色のメモテーブル（ハッシュが安定しているのでワーカー間でも同じ結果）
+        self._color_cache: Dict[str, str] = {}
+        
+        # 増分モードのユーザー別レイアウト状態
+        self._incremental_states: "OrderedDict[str, IncrementalLayoutState]" = OrderedDict()
+        self._incremental_lock = threading.Lock()
     
     def seeded_random(self, seed: float) -> float:
         """シード値を使った固定ランダム関数"""
@@ -28,8 +144,19 @@ class VisualizationService:
     
     def id_to_color(self, experience_id: int) -> str:
         """ID から HSL カラーを生成"""
-        # 体験IDから簡単なハッシュ値を生成
-        hash_value = abs(hash(str(experience_id)))
+        key = str(experience_id)
+        color = self._color_cache.get(key)
+        if color is None:
+            color = self._compute_id_color(key)
+            if len(self._color_cache) >= COLOR_CACHE_SIZE:
+                self._color_cache.clear()
+            self._color_cache[key] = color
+        return color
+    
+    def _compute_id_color(self, key: str) -> str:
+        """ハッシュ値から色を計算"""
+        # 体験IDから安定したハッシュ値を生成
+        hash_value = stable_hash(key)
         
         # 美しい色相範囲を定義
         color_ranges = [
@@ -59,185 +186,646 @@ class VisualizationService:
             return self.category_colors[category]
         return self.id_to_color(experience_id)
     
-    def compute_spiral_positions(self, experiences: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """完了済み体験のらせん配置を計算"""
-        completed_experiences = [exp for exp in experiences if exp.get('completed', False)]
-        positions = []
+    def compute_etag(self, payload: Any, variant: str = "") -> str:
+        """リクエスト内容から決定的な弱いETagを生成
+
+        座標などは入力のみで決まるが、generated_at はリクエストごとに変わるため
+        バイト単位の一致を保証しない弱いバリデーター（W/"..."）にする。
+        """
+        body = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+        digest = hashlib.blake2b(f"{variant}\0{body}".encode('utf-8'), digest_size=16).hexdigest()
+        return f'W/"{digest}"'
+    
+    def seeded_random_array(self, seeds: np.ndarray) -> np.ndarray:
+        """seeded_random の配列版（同じ演算順で計算）"""
+        x = np.sin(seeds) * 10000
+        return x - np.floor(x)
+    
+    def _spiral_layout(self, completed_experiences: List[Dict[str, Any]], start: int = 0,
+                       capacity: Optional[int] = None) -> Dict[str, Any]:
+        """らせん配置を配列で計算（dict形式・カラム形式の共通処理）
+
+        start はらせん上の先頭インデックス、capacity はらせん全体の長さ（既定は件数）。
+        増分モードでは capacity を固定することで既存の球体を動かさずに追加できる。
+        """
+        count = len(completed_experiences)
+        if capacity is None:
+            capacity = start + count
         
         spiral_turns = 2  # らせんの巻数
         depth_range = 6   # 奥行きの範囲
         base_radius = 2   # 基本半径
         
-        for index, exp in enumerate(completed_experiences):
-            # らせんの角度計算
-            t = index / max(len(completed_experiences) - 1, 1)
-            angle = t * spiral_turns * math.pi * 2
-            
-            # Z座標（奥から手前へ）
-            depth = -depth_range/2 + t * depth_range  # -3 から +3 へ
-            
-            # 半径の変化（手前に来るほど少し広がる）
-            radius_variation = base_radius + t * 0.8
-            
-            # 固定ランダムな角度のずれ（±30度）
-            seed = exp.get('id', index)
-            angle_offset = (self.seeded_random(seed * 1.234) - 0.5) * math.pi / 3
-            final_angle = angle + angle_offset
-            
-            # 位置の計算
-            x = math.cos(final_angle) * radius_variation
-            y = math.sin(final_angle) * radius_variation
-            z = depth
-            
-            # 固定ランダムな距離のずれ
-            distance_variation = 0.8 + self.seeded_random(seed * 2.345) * 0.4
-            x *= distance_variation
-            y *= distance_variation
-            
-            # 高さのバリエーション
-            height_offset = (self.seeded_random(seed * 3.456) - 0.5) * 1.5
-            y += height_offset
-            
-            # 難易度に応じてサイズを調整
-            scale_multiplier = 0.8 + (exp.get('level', 1)) * 0.2
-            
-            # 色を計算
-            color = self.get_theme_color(exp.get('id', index), exp.get('category'))
-            
-            positions.append({
+        seeds = [stable_seed(exp.get('id', index)) for index, exp in enumerate(completed_experiences, start)]
+        seed_values = np.asarray(seeds, dtype=np.float64)
+        levels = np.asarray([exp.get('level', 1) for exp in completed_experiences], dtype=np.float64)
+        
+        # らせんの角度計算
+        t = np.arange(start, start + count, dtype=np.float64) / max(capacity - 1, 1)
+        angle = t * spiral_turns * math.pi * 2
+        
+        # Z座標（奥から手前へ）
+        depth = -depth_range/2 + t * depth_range  # -3 から +3 へ
+        
+        # 半径の変化（手前に来るほど少し広がる）
+        radius_variation = base_radius + t * 0.8
+        
+        # 固定ランダムな角度のずれ（±30度）
+        angle_offset = (self.seeded_random_array(seed_values * 1.234) - 0.5) * math.pi / 3
+        final_angle = angle + angle_offset
+        
+        # 位置の計算
+        x = np.cos(final_angle) * radius_variation
+        y = np.sin(final_angle) * radius_variation
+        
+        # 固定ランダムな距離のずれ
+        distance_variation = 0.8 + self.seeded_random_array(seed_values * 2.345) * 0.4
+        x *= distance_variation
+        y *= distance_variation
+        
+        # 高さのバリエーション
+        y += (self.seeded_random_array(seed_values * 3.456) - 0.5) * 1.5
+        
+        # 難易度に応じてサイズを調整
+        scale = 0.8 + levels * 0.2
+        
+        return {'seeds': seeds, 'x': x, 'y': y, 'z': depth, 'scale': scale}
+    
+    def _floating_layout(self, incomplete_missions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """浮遊配置を配列で計算（dict形式・カラム形式の共通処理）"""
+        count = len(incomplete_missions)
+        float_radius = 4.0
+        
+        seeds = [stable_seed(mission.get('id', index)) for index, mission in enumerate(incomplete_missions)]
+        seed_values = np.asarray(seeds, dtype=np.float64)
+        
+        base_angle = (np.arange(count, dtype=np.float64) / max(count, 1)) * math.pi * 2
+        
+        # 固定位置の計算
+        height_offset = self.seeded_random_array(seed_values * 3.456) * 2 - 1  # -1 to 1
+        radius_offset = self.seeded_random_array(seed_values * 4.567) * 0.5    # 0 to 0.5
+        
+        x = np.cos(base_angle) * (float_radius + radius_offset)
+        y = np.sin(base_angle) * (float_radius + radius_offset)
+        z = np.sin(base_angle * 2) * 1.5 + height_offset
+        
+        return {'seeds': seeds, 'x': x, 'y': y, 'z': z}
+    
+    def _curve_layout(self, coords: np.ndarray, ids: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """連続する球体間の曲線の中間制御点と距離を配列で計算"""
+        start, end = coords[:-1], coords[1:]
+        
+        # 中点を計算
+        mid = (start + end) / 2
+        
+        # 距離を計算（二乗はPythonのfloat累乗と同じ丸めになるよう要素ごとに計算）
+        delta = end - start
+        distance = np.array(
+            [math.sqrt(dx**2 + dy**2 + dz**2) for dx, dy, dz in delta.tolist()], dtype=np.float64
+        )
+        
+        # シード値を使って一貫した変位を生成
+        id_values = np.asarray([stable_seed(experience_id or 0) for experience_id in ids])
+        seed = id_values[:-1] + id_values[1:]
+        pseudo_random = (seed % 1000) / 1000
+        
+        bulge = distance * 0.3
+        mid[:, 0] += (pseudo_random - 0.5) * bulge
+        mid[:, 1] += (pseudo_random * 0.7 - 0.35) * bulge
+        mid[:, 2] += (pseudo_random * 0.3 - 0.15) * bulge
+        
+        return mid, distance
+    
+    def compute_spiral_positions(self, experiences: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """完了済み体験のらせん配置を計算（全体験をまとめて配列で計算）"""
+        completed_experiences = [exp for exp in experiences if exp.get('completed', False)]
+        if not completed_experiences:
+            return []
+        
+        return self._spiral_items(completed_experiences, self._spiral_layout(completed_experiences))
+    
+    def _spiral_items(self, completed_experiences: List[Dict[str, Any]], layout: Dict[str, Any],
+                      start: int = 0) -> List[Dict[str, Any]]:
+        """らせん配置の配列から球体データを生成"""
+        indices = layout['index'].tolist() if 'index' in layout else range(start, start + len(completed_experiences))
+        items = [
+            {
                 'experience_id': exp.get('id'),
-                'position': {'x': x, 'y': y, 'z': z},
-                'scale': scale_multiplier,
-                'color': color,
+                'position': {'x': px, 'y': py, 'z': pz},
+                'scale': sc,
+                'color': self.get_theme_color(seed, exp.get('category')),
                 'seed': seed,
                 'spiral_index': index,
-                'depth': depth
-            })
-        
-        return positions
+                'depth': pz
+            }
+            for index, exp, seed, px, py, pz, sc in zip(
+                indices, completed_experiences, layout['seeds'], layout['x'].tolist(),
+                layout['y'].tolist(), layout['z'].tolist(), layout['scale'].tolist()
+            )
+        ]
+        if 'cluster_size' in layout:
+            for item, size in zip(items, layout['cluster_size'].tolist()):
+                item['cluster_size'] = size
+        return items
     
-    def compute_floating_positions(self, experiences: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """進行中ミッションの浮遊配置を計算"""
-        incomplete_missions = [exp for exp in experiences if not exp.get('completed', False)]
-        positions = []
-        
-        float_radius = 4.0
+    def _level_of_detail(self, completed_experiences: List[Dict[str, Any]], layout: Dict[str, Any],
+                         max_spheres: Optional[int], bounds: Optional[Tuple[float, ...]]
+                         ) -> Tuple[List[Dict[str, Any]], Dict[str, Any], Dict[str, Any]]:
+        """範囲外の球体を除き、古い区間をクラスタにまとめて球体数を max_spheres 以下に抑える
+
+        新しい半分（らせんの手前側）は個別に残し、残りの古い球体は連続する区間ごとに
+        重心・最大スケールの1つの球体にまとめる。代表の体験は区間内で最新のもの。
+        """
+        count = len(completed_experiences)
+        index = np.arange(count)
+        if bounds is not None:
+            index = index[_bounds_mask(layout['x'], layout['y'], layout['z'], bounds)]
+        visible_count = len(index)
         
-        for index, mission in enumerate(incomplete_missions):
-            base_angle = (index / max(len(incomplete_missions), 1)) * math.pi * 2
-            
-            # 固定位置の計算
-            seed = mission.get('id', index)
-            height_offset = self.seeded_random(seed * 3.456) * 2 - 1  # -1 to 1
-            radius_offset = self.seeded_random(seed * 4.567) * 0.5    # 0 to 0.5
+        cluster_size = np.ones(visible_count, dtype=np.int64)
+        x, y, z, scale = (layout[key][index] for key in ('x', 'y', 'z', 'scale'))
+        representatives = index
+        if max_spheres is not None and visible_count > max_spheres:
+            keep = max_spheres // 2
+            cluster_count = max_spheres - keep
+            old_count = visible_count - keep
             
-            x = math.cos(base_angle) * (float_radius + radius_offset)
-            y = math.sin(base_angle) * (float_radius + radius_offset)
-            z = math.sin(base_angle * 2) * 1.5 + height_offset
+            starts = (np.arange(cluster_count) * old_count) // cluster_count
+            sizes = np.diff(np.append(starts, old_count))
             
-            # 色を計算
-            color = self.get_theme_color(mission.get('id', index), mission.get('category'))
+            def merge(values: np.ndarray, reducer) -> np.ndarray:
+                return np.concatenate((reducer(values[:old_count], starts), values[old_count:]))
             
-            positions.append({
+            counts = np.concatenate((sizes, np.ones(keep))).astype(np.float64)
+            x = merge(x, np.add.reduceat) / counts
+            y = merge(y, np.add.reduceat) / counts
+            z = merge(z, np.add.reduceat) / counts
+            scale = merge(scale, np.maximum.reduceat)
+            representatives = np.concatenate((index[starts + sizes - 1], index[old_count:]))
+            cluster_size = np.concatenate((sizes, np.ones(keep, dtype=np.int64)))
+        
+        seeds = layout['seeds']
+        reduced = {
+            'seeds': [seeds[i] for i in representatives.tolist()],
+            'x': x,
+            'y': y,
+            'z': z,
+            'scale': scale,
+            'index': representatives,
+            'cluster_size': cluster_size
+        }
+        info = {
+            'visible_count': visible_count,
+            'culled_count': count - visible_count,
+            'sphere_count': len(representatives),
+            'clustered': len(representatives) < visible_count
+        }
+        return [completed_experiences[i] for i in representatives.tolist()], reduced, info
+    
+    def _primitive_budget(self, max_primitives: Optional[int], sphere_count: int,
+                          floating_count: int) -> Tuple[Optional[int], Optional[int]]:
+        """球体＋曲線（球体数−1）＋浮遊ミッションが上限に収まる球体数と浮遊ミッション数
+
+        両方ある場合、浮遊ミッションには上限の半分（球体が少なければその残り）までを割り当てる。
+        """
+        if not max_primitives:
+            return None, None
+        if not sphere_count:
+            return None, max_primitives
+        max_floating = min(floating_count, max(max_primitives // 2, max_primitives - (2 * sphere_count - 1)))
+        return max(1, (max_primitives - max_floating + 1) // 2), max_floating
+    
+    def compute_floating_positions(self, experiences: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """進行中ミッションの浮遊配置を計算（全ミッションをまとめて配列で計算）"""
+        incomplete_missions = [exp for exp in experiences if not exp.get('completed', False)]
+        return self._floating_items(incomplete_missions)
+    
+    def _floating_items(self, incomplete_missions: List[Dict[str, Any]],
+                        layout: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """進行中ミッションの浮遊配置データを生成"""
+        if not incomplete_missions:
+            return []
+        
+        if layout is None:
+            layout = self._floating_layout(incomplete_missions)
+        indices = layout['index'].tolist() if 'index' in layout else range(len(incomplete_missions))
+        return [
+            {
                 'experience_id': mission.get('id'),
-                'position': {'x': x, 'y': y, 'z': z},
-                'color': color,
+                'position': {'x': px, 'y': py, 'z': pz},
+                'color': self.get_theme_color(seed, mission.get('category')),
                 'seed': seed,
                 'index': index,
                 'type': 'floating'
-            })
-        
-        return positions
+            }
+            for index, mission, seed, px, py, pz in zip(
+                indices, incomplete_missions, layout['seeds'], layout['x'].tolist(),
+                layout['y'].tolist(), layout['z'].tolist()
+            )
+        ]
+    
+    def _cull_floating(self, incomplete_missions: List[Dict[str, Any]], layout: Dict[str, Any],
+                       bounds: Tuple[float, ...]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """範囲外の浮遊ミッションを除外"""
+        index = np.flatnonzero(_bounds_mask(layout['x'], layout['y'], layout['z'], bounds))
+        selected = index.tolist()
+        return [incomplete_missions[i] for i in selected], {
+            'seeds': [layout['seeds'][i] for i in selected],
+            'x': layout['x'][index],
+            'y': layout['y'][index],
+            'z': layout['z'][index],
+            'index': index
+        }
+    
+    def _trim_floating(self, incomplete_missions: List[Dict[str, Any]], layout: Dict[str, Any],
+                       limit: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """浮遊ミッションを新しいものから limit 件に絞る"""
+        start = len(incomplete_missions) - limit
+        index = layout['index'][start:] if 'index' in layout else np.arange(start, len(incomplete_missions))
+        return incomplete_missions[start:], {
+            'seeds': layout['seeds'][start:],
+            'x': layout['x'][start:],
+            'y': layout['y'][start:],
+            'z': layout['z'][start:],
+            'index': index
+        }
     
     def compute_connection_curves(self, spiral_positions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """球体間の接続曲線を計算"""
+        """球体間の接続曲線を計算（全区間をまとめて配列で計算）"""
         if len(spiral_positions) < 2:
             return []
         
-        curves = []
+        coords = np.array(
+            [(p['position']['x'], p['position']['y'], p['position']['z']) for p in spiral_positions],
+            dtype=np.float64
+        )
+        mid, distance = self._curve_layout(coords, [p['experience_id'] for p in spiral_positions])
         
-        for i in range(len(spiral_positions) - 1):
-            start_pos = spiral_positions[i]['position']
-            end_pos = spiral_positions[i + 1]['position']
-            
-            # 中点を計算
-            mid_x = (start_pos['x'] + end_pos['x']) / 2
-            mid_y = (start_pos['y'] + end_pos['y']) / 2
-            mid_z = (start_pos['z'] + end_pos['z']) / 2
-            
-            # 距離を計算
-            distance = math.sqrt(
-                (end_pos['x'] - start_pos['x'])**2 +
-                (end_pos['y'] - start_pos['y'])**2 +
-                (end_pos['z'] - start_pos['z'])**2
+        # カーブの制御点と色のグラデーション
+        return [
+            {
+                'start_id': start_item['experience_id'],
+                'end_id': end_item['experience_id'],
+                'points': [
+                    start_item['position'],
+                    {'x': mid_x, 'y': mid_y, 'z': mid_z},
+                    end_item['position']
+                ],
+                'start_color': start_item['color'],
+                'end_color': end_item['color'],
+                'distance': dist
+            }
+            for start_item, end_item, (mid_x, mid_y, mid_z), dist in zip(
+                spiral_positions, spiral_positions[1:], mid.tolist(), distance.tolist()
             )
+        ]
+    
+    def _partition_experiences(self, experiences: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, int]]:
+        """完了/進行中への振り分けとカテゴリー集計を1回の走査で行う"""
+        completed_experiences = []
+        incomplete_missions = []
+        categories = {}
+        for exp in experiences:
+            (completed_experiences if exp.get('completed', False) else incomplete_missions).append(exp)
+            category = exp.get('category', 'その他')
+            categories[category] = categories.get(category, 0) + 1
+        return completed_experiences, incomplete_missions, categories
+    
+    def generate_columnar_visualization_data(self, experiences: List[Dict[str, Any]],
+                                             sections: Tuple[str, ...] = VISUALIZATION_SECTIONS,
+                                             max_primitives: Optional[int] = None,
+                                             bounds: Optional[Tuple[float, ...]] = None) -> Dict[str, Any]:
+        """カラム形式のビジュアライゼーションデータを生成
+
+        座標はfloat32配列、色はパレットへのインデックス。
+        曲線の始点・終点はらせんの i 番目と i+1 番目の球体なので中間制御点のみ返す。
+        詳細度の調整時は spiral に cluster_size（まとめた球体数）を追加する。
+        """
+        completed_experiences, incomplete_missions, categories = self._partition_experiences(experiences)
+        needs_spiral = 'spiral' in sections or 'curves' in sections
+        
+        palette: Dict[str, int] = {}
+        
+        def color_indices(items: List[Dict[str, Any]], seeds: List[Any]) -> np.ndarray:
+            return np.fromiter(
+                (palette.setdefault(self.get_theme_color(seed, item.get('category')), len(palette))
+                 for item, seed in zip(items, seeds)),
+                dtype=np.uint32, count=len(items)
+            )
+        
+        def experience_ids(items: List[Dict[str, Any]]) -> Any:
+            # JavaScriptのNumberと同じ精度で渡す（IDなしはNaN）
+            ids = [item.get('id') for item in items]
+            if any(isinstance(value, str) for value in ids):
+                # UUIDなど文字列IDはそのままリストで渡す
+                return ids
+            return np.fromiter(
+                (value if value is not None else np.nan for value in ids),
+                dtype=np.float64, count=len(items)
+            )
+        
+        missions = incomplete_missions
+        floating = self._floating_layout(missions) if missions and 'floating' in sections else None
+        if floating is not None and bounds is not None:
+            missions, floating = self._cull_floating(missions, floating, bounds)
+        
+        spheres = completed_experiences
+        spiral = self._spiral_layout(spheres) if spheres and needs_spiral else None
+        max_spheres, max_floating = self._primitive_budget(
+            max_primitives, len(spheres) if spiral is not None else 0, len(missions) if floating is not None else 0
+        )
+        lod_info = None
+        if spiral is not None and (bounds is not None or (max_spheres is not None and len(spheres) > max_spheres)):
+            spheres, spiral, lod_info = self._level_of_detail(spheres, spiral, max_spheres, bounds)
+        if floating is not None and max_floating is not None and len(missions) > max_floating:
+            lod_info = {**(lod_info or {}), 'floating_trimmed': len(missions) - max_floating}
+            missions, floating = self._trim_floating(missions, floating, max_floating)
+        
+        spiral_coords = np.empty((0, 3), dtype=np.float64)
+        spiral_section = {
+            'count': 0,
+            'experience_id': np.empty(0, dtype=np.float64),
+            'seed': np.empty(0, dtype=np.float64),
+            'position': np.empty((0, 3), dtype=np.float32),
+            'scale': np.empty(0, dtype=np.float32),
+            'color': np.empty(0, dtype=np.uint32)
+        }
+        if spiral is not None:
+            spiral_coords = np.column_stack((spiral['x'], spiral['y'], spiral['z']))
+            spiral_section = {
+                'count': len(spheres),
+                'experience_id': experience_ids(spheres),
+                'seed': np.asarray(spiral['seeds'], dtype=np.float64),
+                'position': spiral_coords.astype(np.float32),
+                'scale': spiral['scale'].astype(np.float32),
+                'color': color_indices(spheres, spiral['seeds'])
+            }
+            if lod_info is not None:
+                spiral_section['cluster_size'] = spiral['cluster_size'].astype(np.uint32)
+        
+        floating_section = {
+            'count': 0,
+            'experience_id': np.empty(0, dtype=np.float64),
+            'seed': np.empty(0, dtype=np.float64),
+            'position': np.empty((0, 3), dtype=np.float32),
+            'color': np.empty(0, dtype=np.uint32)
+        }
+        if floating is not None:
+            floating_section = {
+                'count': len(missions),
+                'experience_id': experience_ids(missions),
+                'seed': np.asarray(floating['seeds'], dtype=np.float64),
+                'position': np.column_stack((floating['x'], floating['y'], floating['z'])).astype(np.float32),
+                'color': color_indices(missions, floating['seeds'])
+            }
+        
+        curves_section = {
+            'count': 0,
+            'midpoint': np.empty((0, 3), dtype=np.float32),
+            'distance': np.empty(0, dtype=np.float32)
+        }
+        if spiral is not None and len(spheres) >= 2 and 'curves' in sections:
+            mid, distance = self._curve_layout(spiral_coords, [exp.get('id') for exp in spheres])
+            curves_section = {
+                'count': len(spheres) - 1,
+                'midpoint': mid.astype(np.float32),
+                'distance': distance.astype(np.float32)
+            }
+        
+        # パレットの大きさに合わせて色インデックスの型を縮める
+        index_dtype = np.uint8 if len(palette) <= 0x100 else np.uint16 if len(palette) <= 0x10000 else np.uint32
+        spiral_section['color'] = spiral_section['color'].astype(index_dtype)
+        floating_section['color'] = floating_section['color'].astype(index_dtype)
+        
+        result = {'palette': list(palette)}
+        if 'spiral' in sections:
+            result['spiral'] = spiral_section
+        if 'floating' in sections:
+            result['floating'] = floating_section
+        if 'curves' in sections:
+            result['curves'] = curves_section
+        if 'stats' in sections:
+            result['stats'] = {
+                'total_experiences': len(experiences),
+                'completed_count': len(completed_experiences),
+                'incomplete_count': len(incomplete_missions),
+                'categories': categories
+            }
+        if lod_info is not None:
+            result['level_of_detail'] = {'max_primitives': max_primitives, **lod_info}
+        result['generated_at'] = datetime.now().isoformat()
+        return result
+    
+    def generate_visualization_data(self, experiences: List[Dict[str, Any]],
+                                    sections: Tuple[str, ...] = VISUALIZATION_SECTIONS,
+                                    max_primitives: Optional[int] = None,
+                                    bounds: Optional[Tuple[float, ...]] = None) -> Dict[str, Any]:
+        """全体的なビジュアライゼーションデータを生成
+
+        振り分け・件数・カテゴリー分布を1回の走査で求め、sections で指定された
+        セクション（spiral / floating / curves / stats）だけを計算して返す。
+        max_primitives / bounds を指定すると詳細度の調整と範囲外の除外を行い、
+        履歴の長さに関わらず球体・曲線・浮遊ミッションの数を上限以下に抑える。
+        """
+        completed_experiences, incomplete_missions, categories = self._partition_experiences(experiences)
+        result: Dict[str, Any] = {}
+        
+        needs_spiral = bool(completed_experiences) and ('spiral' in sections or 'curves' in sections)
+        
+        # 進行中ミッションの浮遊位置
+        missions: List[Dict[str, Any]] = []
+        floating_layout = None
+        if 'floating' in sections and incomplete_missions:
+            missions, floating_layout = incomplete_missions, self._floating_layout(incomplete_missions)
+            if bounds is not None:
+                missions, floating_layout = self._cull_floating(missions, floating_layout, bounds)
+        max_spheres, max_floating = self._primitive_budget(
+            max_primitives, len(completed_experiences) if needs_spiral else 0, len(missions)
+        )
+        lod_info = None
+        if floating_layout is not None and max_floating is not None and len(missions) > max_floating:
+            lod_info = {'floating_trimmed': len(missions) - max_floating}
+            missions, floating_layout = self._trim_floating(missions, floating_layout, max_floating)
+        floating_positions = self._floating_items(missions, floating_layout) if floating_layout is not None else []
+        
+        # 完了済み体験の球体位置（曲線のみ要求された場合も内部で使用）
+        spiral_positions: List[Dict[str, Any]] = []
+        if needs_spiral:
+            spheres, spiral_layout = completed_experiences, self._spiral_layout(completed_experiences)
+            if bounds is not None or (max_spheres is not None and len(spheres) > max_spheres):
+                spheres, spiral_layout, sphere_lod = self._level_of_detail(spheres, spiral_layout, max_spheres, bounds)
+                lod_info = {**sphere_lod, **(lod_info or {})}
+            spiral_positions = self._spiral_items(spheres, spiral_layout)
+        if 'spiral' in sections:
+            result['spiral_positions'] = spiral_positions
+        
+        if 'floating' in sections:
+            result['floating_positions'] = floating_positions
+        
+        # 接続曲線
+        if 'curves' in sections:
+            result['connection_curves'] = self.compute_connection_curves(spiral_positions)
+        
+        # 統計情報とカテゴリー分布
+        if 'stats' in sections:
+            result['stats'] = {
+                'total_experiences': len(experiences),
+                'completed_count': len(completed_experiences),
+                'incomplete_count': len(incomplete_missions),
+                'categories': categories
+            }
+        
+        if lod_info is not None:
+            result['level_of_detail'] = {'max_primitives': max_primitives, **lod_info}
+        
+        result['generated_at'] = datetime.now().isoformat()
+        return result
+
+    def _experience_key(self, experience: Dict[str, Any]) -> str:
+        """再送された体験と照合できる安定したキー（IDがなければ内容から作る）"""
+        return experience_id(experience)
+    
+    def _count_category(self, state: IncrementalLayoutState, category: Optional[str], delta: int) -> None:
+        category = category if category is not None else 'その他'
+        count = state.categories.get(category, 0) + delta
+        if count > 0:
+            state.categories[category] = count
+        else:
+            state.categories.pop(category, None)
+    
+    def _relayout_spiral(self, state: IncrementalLayoutState) -> None:
+        """容量を更新してらせんと曲線を全て再計算"""
+        state.capacity = state.required_capacity(len(state.completed))
+        layout = self._spiral_layout(state.completed, capacity=state.capacity) if state.completed else None
+        state.spiral = self._spiral_items(state.completed, layout) if layout else []
+        state.curves = self.compute_connection_curves(state.spiral)
+    
+    def _relayout_floating(self, state: IncrementalLayoutState) -> None:
+        """進行中ミッションの浮遊配置を再計算（件数は進行中のものだけなので履歴長に依存しない）"""
+        state.floating = self.compute_floating_positions(list(state.missions.values()))
+    
+    def _incremental_full_response(self, state: IncrementalLayoutState) -> Dict[str, Any]:
+        return {
+            'mode': 'full',
+            'token': state.token,
+            'layout_capacity': state.capacity,
+            'spiral_positions': state.spiral,
+            'floating_positions': state.floating,
+            'floating_changed': True,
+            'connection_curves': state.curves,
+            'stats': state.stats(),
+            'generated_at': datetime.now().isoformat()
+        }
+    
+    def generate_incremental_visualization(self, user_id: str, experiences: List[Dict[str, Any]],
+                                           token: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """前回の描画からの差分だけを返す増分ビジュアライゼーション
+
+        token なし: experiences を全履歴として状態を作り直し、全データ（mode=full）を返す。
+        token あり: experiences を追加・変更された体験として扱い、新規または変化した
+        球体・曲線だけ（mode=delta）を返す。token が現在の状態と一致しない場合は None
+        （状態はワーカーごとに持つため、呼び出し元は全履歴を渡して作り直す）。
+        """
+        with self._incremental_lock:
+            state = self._incremental_states.get(user_id)
+            if token is not None and (state is None or state.token != token):
+                return None
             
-            # シード値を使って一貫した変位を生成
-            start_id = spiral_positions[i]['experience_id']
-            end_id = spiral_positions[i + 1]['experience_id']
-            seed = (start_id or 0) + (end_id or 0)
-            pseudo_random = (seed % 1000) / 1000
-            
-            bulge = distance * 0.3
-            mid_x += (pseudo_random - 0.5) * bulge
-            mid_y += (pseudo_random * 0.7 - 0.35) * bulge
-            mid_z += (pseudo_random * 0.3 - 0.15) * bulge
+            if token is None:
+                state = IncrementalLayoutState(INCREMENTAL_MIN_CAPACITY)
+                self._incremental_states[user_id] = state
+                while len(self._incremental_states) > INCREMENTAL_STATE_SIZE:
+                    self._incremental_states.popitem(last=False)
+            else:
+                self._incremental_states.move_to_end(user_id)
             
-            # カーブの制御点
-            curve_points = [
-                start_pos,
-                {'x': mid_x, 'y': mid_y, 'z': mid_z},
-                end_pos
-            ]
+            state.version += 1
+            return self._apply_incremental_update(state, experiences, full=token is None)
+    
+    def _apply_incremental_update(self, state: IncrementalLayoutState, experiences: List[Dict[str, Any]],
+                                  full: bool) -> Dict[str, Any]:
+        appended: List[Dict[str, Any]] = []
+        changed_indices = set()
+        floating_changed = False
+        
+        for exp in experiences:
+            key = self._experience_key(exp)
+            index = state.completed_index.get(key)
+            if index is not None:
+                # 完了済み体験の更新（位置は変わらず、色・サイズのみ変わりうる）
+                self._count_category(state, state.completed[index].get('category', 'その他'), -1)
+                self._count_category(state, exp.get('category', 'その他'), 1)
+                state.completed[index] = exp
+                changed_indices.add(index)
+                continue
             
-            # 色のグラデーション
-            start_color = spiral_positions[i]['color']
-            end_color = spiral_positions[i + 1]['color']
+            previous = state.missions.get(key)
+            if previous is not None:
+                self._count_category(state, previous.get('category', 'その他'), -1)
+                state.total_experiences -= 1
+                floating_changed = True
+                if exp.get('completed', False):
+                    del state.missions[key]
             
-            curves.append({
-                'start_id': start_id,
-                'end_id': end_id,
-                'points': curve_points,
-                'start_color': start_color,
-                'end_color': end_color,
-                'distance': distance
-            })
-        
-        return curves
-    
-    def generate_visualization_data(self, experiences: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """全体的なビジュアライゼーションデータを生成"""
-        # 完了済み体験の球体位置
-        spiral_positions = self.compute_spiral_positions(experiences)
+            self._count_category(state, exp.get('category', 'その他'), 1)
+            state.total_experiences += 1
+            if exp.get('completed', False):
+                state.completed_index[key] = len(state.completed)
+                state.completed.append(exp)
+                appended.append(exp)
+            else:
+                state.missions[key] = exp
+                floating_changed = True
         
-        # 進行中ミッションの浮遊位置
-        floating_positions = self.compute_floating_positions(experiences)
+        if floating_changed or full:
+            self._relayout_floating(state)
         
-        # 接続曲線
-        connection_curves = self.compute_connection_curves(spiral_positions)
+        if full or len(state.completed) > state.capacity:
+            self._relayout_spiral(state)
+            return self._incremental_full_response(state)
         
-        # 統計情報
-        total_experiences = len(experiences)
-        completed_count = len([exp for exp in experiences if exp.get('completed', False)])
-        incomplete_count = total_experiences - completed_count
+        # 新しい球体だけを固定容量のらせん上に配置
+        start = len(state.spiral)
+        new_spheres = []
+        if appended:
+            layout = self._spiral_layout(appended, start=start, capacity=state.capacity)
+            new_spheres = self._spiral_items(appended, layout, start)
+            state.spiral.extend(new_spheres)
         
-        # カテゴリー分布
-        categories = {}
-        for exp in experiences:
-            category = exp.get('category', 'その他')
-            categories[category] = categories.get(category, 0) + 1
+        # 変更された球体は位置を保ったまま色・サイズを再計算
+        changed_spheres = []
+        for index in sorted(changed_indices):
+            if index >= start:
+                continue
+            layout = self._spiral_layout([state.completed[index]], start=index, capacity=state.capacity)
+            state.spiral[index] = self._spiral_items([state.completed[index]], layout, index)[0]
+            changed_spheres.append(state.spiral[index])
+        
+        # 影響を受ける曲線（変更された球体の前後と新しい球体への接続）を再計算
+        curve_indices = set()
+        for index in changed_indices:
+            curve_indices.update(i for i in (index - 1, index) if 0 <= i < len(state.spiral) - 1)
+        curve_indices.update(range(max(start - 1, 0), len(state.spiral) - 1))
+        
+        changed_curves = []
+        for index in sorted(curve_indices):
+            curve = self.compute_connection_curves(state.spiral[index:index + 2])[0]
+            if index < len(state.curves):
+                state.curves[index] = curve
+            else:
+                state.curves.append(curve)
+            changed_curves.append({**curve, 'curve_index': index})
         
         return {
-            'spiral_positions': spiral_positions,
-            'floating_positions': floating_positions,
-            'connection_curves': connection_curves,
-            'stats': {
-                'total_experiences': total_experiences,
-                'completed_count': completed_count,
-                'incomplete_count': incomplete_count,
-                'categories': categories
-            },
-            'generated_at': f"{__import__('datetime').datetime.now().isoformat()}"
+            'mode': 'delta',
+            'token': state.token,
+            'layout_capacity': state.capacity,
+            'spiral_positions': changed_spheres + new_spheres,
+            'floating_positions': state.floating if floating_changed else [],
+            'floating_changed': floating_changed,
+            'connection_curves': changed_curves,
+            'stats': state.stats(),
+            'generated_at': datetime.now().isoformat()
         }
 
 # サービスインスタンス
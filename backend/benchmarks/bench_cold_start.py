@@ -0,0 +1,93 @@
+# コールドスタートの計測（import時間の内訳と、起動直後の /health の応答時間）
+#
+# 実行方法（backend ディレクトリで）:
+#   python -m benchmarks.bench_cold_start
+#   python -m benchmarks.bench_cold_start --runs 5 --top 25
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# 新しいプロセスで app.main を import し、最初の /health までの時間をJSONで出力する
+CHILD_SCRIPT = """
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+import httpx
+
+async def first_health():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://cold") as client:
+        request_started = time.perf_counter()
+        response = await client.get("/health")
+        return response.status_code, time.perf_counter() - request_started
+
+status, health_seconds = asyncio.run(first_health())
+print("COLD_START " + json.dumps({
+    "import_seconds": imported - started,
+    "first_health_seconds": health_seconds,
+    "status": status
+}))
+"""
+
+
+def run_child() -> Tuple[Dict[str, float], List[Tuple[str, int, int]]]:
+    """子プロセスを1回実行し、計測結果と -X importtime の各行 (モジュール, 自身μs, 累積μs) を返す"""
+    env = dict(os.environ, LOG_FILE="")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_SCRIPT],
+        capture_output=True, text=True, env=env, check=True
+    )
+    result = None
+    for line in completed.stdout.splitlines():
+        if line.startswith("COLD_START "):
+            result = json.loads(line[len("COLD_START "):])
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():
+            imports.append((name, int(self_us), int(cumulative_us)))
+    return result, imports
+
+
+def run(runs: int, top: int) -> None:
+    results = []
+    cumulative: Dict[str, List[int]] = defaultdict(list)
+    for _ in range(runs):
+        result, imports = run_child()
+        results.append(result)
+        for name, _, cumulative_us in imports:
+            cumulative[name].append(cumulative_us)
+
+    import_times = [r["import_seconds"] * 1000 for r in results]
+    health_times = [r["first_health_seconds"] * 1000 for r in results]
+    print(f"runs: {runs}")
+    print(f"import app.main   : median {statistics.median(import_times):8.1f} ms  (min {min(import_times):.1f})")
+    print(f"first GET /health : median {statistics.median(health_times):8.1f} ms  (min {min(health_times):.1f})")
+    print(f"status            : {sorted({r['status'] for r in results})}")
+
+    # 最上位のパッケージ単位と app.* モジュール単位の累積import時間
+    print(f"\n{'module':<48} | {'cumulative ms':>13}")
+    print("-" * 64)
+    medians = {name: statistics.median(values) for name, values in cumulative.items()}
+    interesting = [
+        (name, value) for name, value in medians.items()
+        if name.startswith("app") or "." not in name
+    ]
+    for name, value in sorted(interesting, key=lambda item: item[1], reverse=True)[:top]:
+        print(f"{name:<48} | {value / 1000:>13.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold start and import-time profile")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+    run(args.runs, args.top)
@@ -0,0 +1,177 @@
+# レコメンド・成長分析・ビジュアライゼーションのスループット計測（偽モデル使用、ネットワーク不要）
+#
+# 実行方法（backend ディレクトリで）:
+#   python -m benchmarks.bench_pipeline
+#   python -m benchmarks.bench_pipeline --mode asgi --sizes 10 1000 --requests 400 --concurrency 32
+#   python -m benchmarks.bench_pipeline --latency 0.5 --jitter 0.2 --failure-rate 0.1
+import argparse
+import asyncio
+import math
+import random
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import httpx
+
+from app.main import app
+from app.services.services import ai_service, recommendation_pool, get_recommendation_service, analyze_growth_trends
+from app.services.visualization_service import VisualizationService
+
+from .fake_llm import FakeChatModel, install_fake_model
+
+CATEGORIES = ["ライフスタイル", "アート・創作", "料理・グルメ", "ソーシャル", "学習・読書", "自然・アウトドア", "エンタメ"]
+
+Call = Callable[[int], Awaitable[Any]]
+
+
+def make_history(size: int, seed: int) -> List[Dict[str, Any]]:
+    """合成の体験履歴を生成"""
+    rng = random.Random(seed)
+    base_id = 1_700_000_000_000 + seed * 10_000_000
+    return [
+        {
+            "id": base_id + i * 997,
+            "title": f"体験{i}",
+            "category": rng.choice(CATEGORIES),
+            "level": rng.randint(1, 3),
+            "completed": rng.random() < 0.8
+        }
+        for i in range(size)
+    ]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_load(call: Call, requests: int, concurrency: int) -> Tuple[float, List[float], int]:
+    """requests 回の呼び出しを concurrency 並列で実行し、(経過秒, 各レイテンシ, 失敗数) を返す"""
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                await call(index)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return time.perf_counter() - started, latencies, errors
+
+
+async def measure_memory(call: Call, requests: int) -> float:
+    """順に requests 回呼び出したときのピークメモリ（MiB、tracemalloc計測）"""
+    tracemalloc.start()
+    try:
+        for index in range(requests):
+            try:
+                await call(index)
+            except Exception:
+                pass
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def service_scenarios(histories: List[List[Dict[str, Any]]]) -> Dict[str, Call]:
+    """サービス関数を直接呼ぶシナリオ"""
+    visualization = VisualizationService()
+
+    async def recommendation(index: int):
+        return await get_recommendation_service(2, {}, histories[index % len(histories)])
+
+    async def growth(index: int):
+        return await analyze_growth_trends(histories[index % len(histories)])
+
+    async def visualization_data(index: int):
+        return visualization.generate_visualization_data(histories[index % len(histories)])
+
+    return {"recommendation": recommendation, "growth": growth, "visualization": visualization_data}
+
+
+def asgi_scenarios(client: httpx.AsyncClient, histories: List[List[Dict[str, Any]]]) -> Dict[str, Call]:
+    """ASGIアプリにHTTPリクエストを送るシナリオ（ネットワークは使わない）"""
+
+    async def post(path: str, payload: Any):
+        response = await client.post(path, json=payload)
+        response.raise_for_status()
+        return response
+
+    async def recommendation(index: int):
+        return await post("/api/recommendations", {"level": 2, "preferences": {}, "experiences": histories[index % len(histories)]})
+
+    async def growth(index: int):
+        return await post("/api/growth/analysis", histories[index % len(histories)])
+
+    async def visualization_data(index: int):
+        return await post("/api/visualization/experience-strings", histories[index % len(histories)])
+
+    return {"recommendation": recommendation, "growth": growth, "visualization": visualization_data}
+
+
+async def run(args: argparse.Namespace) -> None:
+    random.seed(args.seed)
+    model = FakeChatModel(args.latency, args.jitter, args.failure_rate, seed=args.seed)
+    install_fake_model(ai_service, model, use_cache=args.cache, rate_limit=args.rate_limit)
+    recommendation_pool.enabled = args.pool
+
+    print(f"fake LLM: latency={args.latency}s jitter=±{args.jitter}s failure_rate={args.failure_rate} "
+          f"| requests={args.requests} concurrency={args.concurrency} mode={args.mode}")
+    print(f"{'mode':>7} | {'scenario':>14} | {'size':>6} | {'req/s':>8} | {'p50 ms':>8} | {'p95 ms':>8} | "
+          f"{'p99 ms':>8} | {'errors':>6} | {'peak MiB':>8}")
+    print("-" * 100)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        modes = ["service", "asgi"] if args.mode == "both" else [args.mode]
+        for mode in modes:
+            for size in args.sizes:
+                histories = [make_history(size, args.seed + variant) for variant in range(args.variants)]
+                scenarios = service_scenarios(histories) if mode == "service" else asgi_scenarios(client, histories)
+                for name, call in scenarios.items():
+                    if args.scenarios and name not in args.scenarios:
+                        continue
+                    await run_load(call, min(args.requests, args.concurrency), args.concurrency)  # ウォームアップ
+                    elapsed, latencies, errors = await run_load(call, args.requests, args.concurrency)
+                    peak = await measure_memory(call, args.memory_requests)
+                    latencies.sort()
+                    print(
+                        f"{mode:>7} | {name:>14} | {size:>6} | {len(latencies) / elapsed:>8.1f} | "
+                        f"{percentile(latencies, 50) * 1000:>8.1f} | {percentile(latencies, 95) * 1000:>8.1f} | "
+                        f"{percentile(latencies, 99) * 1000:>8.1f} | {errors:>6} | {peak:>8.2f}"
+                    )
+
+    print(f"\nfake LLM calls: {model.stats()} | circuit: {ai_service.circuit_breaker.state}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recommendation pipeline benchmark with a fake LLM")
+    parser.add_argument("--mode", choices=["service", "asgi", "both"], default="both")
+    parser.add_argument("--scenarios", nargs="+", choices=["recommendation", "growth", "visualization"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--variants", type=int, default=32, help="サイズごとに用意する履歴の種類数")
+    parser.add_argument("--memory-requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache", action="store_true", help="応答キャッシュを有効にする")
+    parser.add_argument("--rate-limit", action="store_true", help="レート制限を有効にする")
+    parser.add_argument("--pool", action="store_true", help="レコメンドの事前生成プールを有効にする")
+    args = parser.parse_args()
+    asyncio.run(run(args))
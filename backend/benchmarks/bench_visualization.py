@@ -0,0 +1,229 @@
+# VisualizationService のベンチマーク（NumPy一括計算 vs 従来のスカラー計算）
+#
+# 実行方法（backend ディレクトリで）:
+#   python -m benchmarks.bench_visualization
+#   python -m benchmarks.bench_visualization --sizes 1000 10000 100000 --repeat 3
+import argparse
+import gc
+import math
+import random
+import time
+from typing import List, Dict, Any
+
+from app.services.visualization_service import VisualizationService
+
+
+class ScalarVisualizationService(VisualizationService):
+    """比較用: 1点ずつ math.sin/math.cos で計算する従来実装"""
+
+    def compute_spiral_positions(self, experiences: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """完了済み体験のらせん配置を計算"""
+        completed_experiences = [exp for exp in experiences if exp.get('completed', False)]
+        positions = []
+        
+        spiral_turns = 2  # らせんの巻数
+        depth_range = 6   # 奥行きの範囲
+        base_radius = 2   # 基本半径
+        
+        for index, exp in enumerate(completed_experiences):
+            # らせんの角度計算
+            t = index / max(len(completed_experiences) - 1, 1)
+            angle = t * spiral_turns * math.pi * 2
+            
+            # Z座標（奥から手前へ）
+            depth = -depth_range/2 + t * depth_range  # -3 から +3 へ
+            
+            # 半径の変化（手前に来るほど少し広がる）
+            radius_variation = base_radius + t * 0.8
+            
+            # 固定ランダムな角度のずれ（±30度）
+            seed = exp.get('id', index)
+            angle_offset = (self.seeded_random(seed * 1.234) - 0.5) * math.pi / 3
+            final_angle = angle + angle_offset
+            
+            # 位置の計算
+            x = math.cos(final_angle) * radius_variation
+            y = math.sin(final_angle) * radius_variation
+            z = depth
+            
+            # 固定ランダムな距離のずれ
+            distance_variation = 0.8 + self.seeded_random(seed * 2.345) * 0.4
+            x *= distance_variation
+            y *= distance_variation
+            
+            # 高さのバリエーション
+            height_offset = (self.seeded_random(seed * 3.456) - 0.5) * 1.5
+            y += height_offset
+            
+            # 難易度に応じてサイズを調整
+            scale_multiplier = 0.8 + (exp.get('level', 1)) * 0.2
+            
+            # 色を計算
+            color = self.get_theme_color(exp.get('id', index), exp.get('category'))
+            
+            positions.append({
+                'experience_id': exp.get('id'),
+                'position': {'x': x, 'y': y, 'z': z},
+                'scale': scale_multiplier,
+                'color': color,
+                'seed': seed,
+                'spiral_index': index,
+                'depth': depth
+            })
+        
+        return positions
+    
+    def compute_floating_positions(self, experiences: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """進行中ミッションの浮遊配置を計算"""
+        incomplete_missions = [exp for exp in experiences if not exp.get('completed', False)]
+        positions = []
+        
+        float_radius = 4.0
+        
+        for index, mission in enumerate(incomplete_missions):
+            base_angle = (index / max(len(incomplete_missions), 1)) * math.pi * 2
+            
+            # 固定位置の計算
+            seed = mission.get('id', index)
+            height_offset = self.seeded_random(seed * 3.456) * 2 - 1  # -1 to 1
+            radius_offset = self.seeded_random(seed * 4.567) * 0.5    # 0 to 0.5
+            
+            x = math.cos(base_angle) * (float_radius + radius_offset)
+            y = math.sin(base_angle) * (float_radius + radius_offset)
+            z = math.sin(base_angle * 2) * 1.5 + height_offset
+            
+            # 色を計算
+            color = self.get_theme_color(mission.get('id', index), mission.get('category'))
+            
+            positions.append({
+                'experience_id': mission.get('id'),
+                'position': {'x': x, 'y': y, 'z': z},
+                'color': color,
+                'seed': seed,
+                'index': index,
+                'type': 'floating'
+            })
+        
+        return positions
+    
+    def compute_connection_curves(self, spiral_positions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """球体間の接続曲線を計算"""
+        if len(spiral_positions) < 2:
+            return []
+        
+        curves = []
+        
+        for i in range(len(spiral_positions) - 1):
+            start_pos = spiral_positions[i]['position']
+            end_pos = spiral_positions[i + 1]['position']
+            
+            # 中点を計算
+            mid_x = (start_pos['x'] + end_pos['x']) / 2
+            mid_y = (start_pos['y'] + end_pos['y']) / 2
+            mid_z = (start_pos['z'] + end_pos['z']) / 2
+            
+            # 距離を計算
+            distance = math.sqrt(
+                (end_pos['x'] - start_pos['x'])**2 +
+                (end_pos['y'] - start_pos['y'])**2 +
+                (end_pos['z'] - start_pos['z'])**2
+            )
+            
+            # シード値を使って一貫した変位を生成
+            start_id = spiral_positions[i]['experience_id']
+            end_id = spiral_positions[i + 1]['experience_id']
+            seed = (start_id or 0) + (end_id or 0)
+            pseudo_random = (seed % 1000) / 1000
+            
+            bulge = distance * 0.3
+            mid_x += (pseudo_random - 0.5) * bulge
+            mid_y += (pseudo_random * 0.7 - 0.35) * bulge
+            mid_z += (pseudo_random * 0.3 - 0.15) * bulge
+            
+            # カーブの制御点
+            curve_points = [
+                start_pos,
+                {'x': mid_x, 'y': mid_y, 'z': mid_z},
+                end_pos
+            ]
+            
+            # 色のグラデーション
+            start_color = spiral_positions[i]['color']
+            end_color = spiral_positions[i + 1]['color']
+            
+            curves.append({
+                'start_id': start_id,
+                'end_id': end_id,
+                'points': curve_points,
+                'start_color': start_color,
+                'end_color': end_color,
+                'distance': distance
+            })
+        
+        return curves
+
+
+CATEGORIES = ["ライフスタイル", "アート・創作", "料理・グルメ", "ソーシャル", "学習・読書", "自然・アウトドア", "エンタメ"]
+
+
+def make_experiences(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """合成の体験履歴を生成"""
+    rng = random.Random(seed)
+    base_id = 1_700_000_000_000
+    return [
+        {
+            "id": base_id + i * 997,
+            "category": rng.choice(CATEGORIES),
+            "level": rng.randint(1, 3),
+            "completed": rng.random() < 0.8
+        }
+        for i in range(count)
+    ]
+
+
+def best_time(func, repeat: int) -> float:
+    """timeit と同様にGCを止めて最短時間を計測"""
+    best = math.inf
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return best
+
+
+def run(sizes: List[int], repeat: int) -> None:
+    vectorized = VisualizationService()
+    scalar = ScalarVisualizationService()
+
+    print(f"{'size':>8} | {'scalar (ms)':>12} | {'numpy (ms)':>12} | {'speedup':>8} | identical")
+    print("-" * 64)
+    for size in sizes:
+        experiences = make_experiences(size)
+
+        def pipeline(service):
+            spiral = service.compute_spiral_positions(experiences)
+            floating = service.compute_floating_positions(experiences)
+            curves = service.compute_connection_curves(spiral)
+            return spiral, floating, curves
+
+        identical = pipeline(scalar) == pipeline(vectorized)
+        scalar_time = best_time(lambda: pipeline(scalar), repeat)
+        vector_time = best_time(lambda: pipeline(vectorized), repeat)
+        print(
+            f"{size:>8} | {scalar_time * 1000:>12.1f} | {vector_time * 1000:>12.1f} | "
+            f"{scalar_time / vector_time:>7.2f}x | {identical}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VisualizationService geometry benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
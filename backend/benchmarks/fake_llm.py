@@ -0,0 +1,114 @@
+# ベンチマーク用の偽チャットモデル（ネットワークを使わずに Gemini の遅延・失敗を再現）
+import asyncio
+import json
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import app.services.ai_service as ai_service_module
+from app.services.rate_limiter import LLMRateLimiter
+
+# 全てのプロンプト種別（レコメンド・強化・カスタム・成長分析）のパースに通る応答
+FAKE_RESPONSE = json.dumps({
+    "title": "知らない駅で降りてみる",
+    "category": "ライフスタイル",
+    "type": "lifestyle",
+    "icon": "MapPin",
+    "description": "普段は通過するだけの駅で降りて、30分だけ歩いてみましょう",
+    "estimated_time": "1-2時間",
+    "enhanced_description": "いつもの路線の途中にある、まだ知らない街を歩いてみましょう",
+    "encouragement": "小さな寄り道が新しい発見につながります",
+    "tips": ["地図を見ずに歩く", "気になったお店に入ってみる"],
+    "expected_discovery": "身近な場所にある知らない風景",
+    "insights": ["新しいカテゴリーへの挑戦が増えています"],
+    "next_challenges": ["アート・創作"],
+    "next_challenge_areas": ["アート・創作"],
+    "summary": "多様な体験を広げている段階です",
+    "growth_stage": "developing"
+}, ensure_ascii=False)
+
+
+class FakeMessage:
+    """LangChainを読み込んでいない場合に HumanMessage の代わりに使うメッセージ"""
+
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeResponse:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeLLMError(Exception):
+    """偽モデルが注入した失敗"""
+
+
+class FakeChatModel:
+    """ChatGoogleGenerativeAI と同じ呼び出し口を持つ偽モデル
+
+    latency 秒 ± jitter 秒の遅延の後に FAKE_RESPONSE を返し、failure_rate の割合で失敗する。
+    """
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.1, failure_rate: float = 0.0,
+                 response: str = FAKE_RESPONSE, chunk_size: int = 32, seed: Optional[int] = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.response = response
+        self.chunk_size = max(1, chunk_size)
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def _maybe_fail(self) -> None:
+        if self._random.random() < self.failure_rate:
+            self.failures += 1
+            raise FakeLLMError("injected failure")
+
+    async def ainvoke(self, messages: List[Any]) -> FakeResponse:
+        self.calls += 1
+        await asyncio.sleep(self._delay())
+        self._maybe_fail()
+        return FakeResponse(self.response)
+
+    def invoke(self, messages: List[Any]) -> FakeResponse:
+        self.calls += 1
+        time.sleep(self._delay())
+        self._maybe_fail()
+        return FakeResponse(self.response)
+
+    async def abatch(self, inputs: List[List[Any]], return_exceptions: bool = False) -> List[Any]:
+        results = await asyncio.gather(*(self.ainvoke(messages) for messages in inputs),
+                                       return_exceptions=return_exceptions)
+        return list(results)
+
+    async def astream(self, messages: List[Any]) -> AsyncIterator[FakeResponse]:
+        self.calls += 1
+        delay = self._delay()
+        chunks = [self.response[i:i + self.chunk_size] for i in range(0, len(self.response), self.chunk_size)]
+        for chunk in chunks:
+            await asyncio.sleep(delay / len(chunks))
+            yield FakeResponse(chunk)
+        self._maybe_fail()
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "failures": self.failures}
+
+
+def install_fake_model(service, model: FakeChatModel, use_cache: bool = False, rate_limit: bool = False) -> None:
+    """AIRecommendationService のモデルを偽モデルに差し替える
+
+    既定では応答キャッシュとレート制限を外し、毎回モデルを呼び出す状態で計測する。
+    """
+    if ai_service_module.HumanMessage is None:
+        ai_service_module.HumanMessage = FakeMessage
+    service.model = model
+    service.enabled = True
+    if not use_cache:
+        service.response_cache = None
+    if not rate_limit:
+        service.rate_limiter = LLMRateLimiter(requests_per_minute=0, tokens_per_minute=0)
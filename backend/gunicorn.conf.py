@@ -0,0 +1,35 @@
+# gunicorn設定（uvicornワーカーによるマルチワーカー起動）
+#
+# 実行方法（backend ディレクトリで）:
+#   gunicorn app.main:app -c gunicorn.conf.py
+#   WEB_CONCURRENCY=4 gunicorn app.main:app -c gunicorn.conf.py
+#
+# アプリはfork前に1回だけ読み込み（preload_app）、チャレンジカタログ・プロンプトなどの
+# 読み取り専用データをワーカー間でコピーオンライトで共有する。
+# 履歴・フィードバック・AI応答キャッシュはワーカー間で共有するSQLiteに保存される。
+import gc
+import multiprocessing
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+
+# アプリは読み込み時に WEB_CONCURRENCY を参照する（レート制限の等分・キャッシュの共有）
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+worker_class = "uvicorn_worker.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    """fork前にカタログの索引とプロンプトを読み込み、以降のGCで共有ページが書き換えられないようにする"""
+    from app.services.services import ai_service, serendipity_engine
+
+    serendipity_engine.warm_up()
+    ai_service.prompt_loader.preload()
+    # ここまでに生成したオブジェクトをGCの対象から外す（参照カウント以外でページがコピーされるのを防ぐ）
+    gc.freeze()
+    server.log.info("Preloaded read-only data for %d workers", workers)
@@ -0,0 +1,45 @@
+-- ユーザー体験履歴（追記専用）とカテゴリー別集計
+create table if not exists public.user_experiences (
+    seq bigserial primary key,
+    user_id text not null,
+    experience_id text,
+    category text,
+    completed boolean not null default false,
+    data jsonb not null,
+    created_at timestamptz not null default now(),
+    unique (user_id, experience_id)
+);
+create index if not exists idx_user_experiences_user_seq on public.user_experiences (user_id, seq);
+
+create table if not exists public.user_category_counts (
+    user_id text not null,
+    category text not null,
+    count integer not null default 0,
+    primary key (user_id, category)
+);
+
+-- 体験の追記時にカテゴリー別集計を更新
+create or replace function public.increment_user_category_count()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into public.user_category_counts (user_id, category, count)
+    values (new.user_id, coalesce(new.category, 'その他'), 1)
+    on conflict (user_id, category) do update set count = public.user_category_counts.count + 1;
+    return new;
+end;
+$$;
+
+drop trigger if exists trg_user_experiences_count on public.user_experiences;
+create trigger trg_user_experiences_count
+after insert on public.user_experiences
+for each row execute function public.increment_user_category_count();
+
+create table if not exists public.user_feedback (
+    seq bigserial primary key,
+    user_id text not null,
+    data jsonb not null,
+    created_at timestamptz not null default now()
+);
+create index if not exists idx_user_feedback_user_seq on public.user_feedback (user_id, seq);
@@ -0,0 +1,23 @@
+-- 体験のカテゴリーが更新された場合にカテゴリー別集計を付け替える
+create or replace function public.recount_user_category_count()
+returns trigger
+language plpgsql
+as $$
+begin
+    update public.user_category_counts set count = count - 1
+    where user_id = old.user_id and category = coalesce(old.category, 'その他');
+    delete from public.user_category_counts
+    where user_id = old.user_id and category = coalesce(old.category, 'その他') and count <= 0;
+    insert into public.user_category_counts (user_id, category, count)
+    values (new.user_id, coalesce(new.category, 'その他'), 1)
+    on conflict (user_id, category) do update set count = public.user_category_counts.count + 1;
+    return new;
+end;
+$$;
+
+drop trigger if exists trg_user_experiences_recount on public.user_experiences;
+create trigger trg_user_experiences_recount
+after update of category on public.user_experiences
+for each row
+when (coalesce(old.category, 'その他') is distinct from coalesce(new.category, 'その他'))
+execute function public.recount_user_category_count();